@@ -0,0 +1,44 @@
+from typing import List, Dict
+
+from neo4j import AsyncGraphDatabase
+from database import verification_parameters
+
+class AsyncCypherDatabase:
+    """
+    A neo4j Cypher graph database on the asyncio driver
+
+    Only the read operations needed to validate candidates are provided,
+    use CypherDatabase to create the database.
+    Each call opens its own session, so calls could run concurrently.
+    """
+    def __init__(self, uri, user, password, max_connection_pool_size: int = 100, fetch_size: int = 1000):
+        """
+        ```max_connection_pool_size``` connections are kept by the driver,
+        ```fetch_size``` records are fetched from the server at a time
+        """
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password),
+                                                max_connection_pool_size=max_connection_pool_size)
+        self.fetch_size = fetch_size
+
+    async def close(self):
+        await self.driver.close()
+
+    async def query(self, query: str, parameters: Dict = None) -> list:
+        """
+        Execute a Cypher query, and return result
+        """
+        async with self.driver.session(fetch_size=self.fetch_size) as session:
+            return await session.execute_read(self._query, query, parameters)
+
+    @staticmethod
+    async def _query(tx, query: str, parameters: Dict = None) -> list:
+        result = await tx.run(query, parameters)
+        return [record async for record in result]
+
+    async def verify(self, query: str, expected: List[tuple], parameters: Dict = None) -> bool:
+        """
+        Execute a verification query (see dsl.Return.to_verification_Cypher),
+        the server compares the result with ```expected``` and only the verdict comes back
+        """
+        result = await self.query(query, {**(parameters or {}), **verification_parameters(expected)})
+        return result[0]["verdict"]
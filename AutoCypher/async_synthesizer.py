@@ -0,0 +1,172 @@
+from typing import List, Dict, Tuple, Iterator, Optional, Union
+from itertools import islice
+import asyncio
+import time
+
+from example_parser import Example
+from async_database import AsyncCypherDatabase
+from evaluator import MODE_FETCH, MODE_VERIFY, same_result
+from synthesizer import Synthesizer, MAX_SKETCH_SIZE
+from budget import SynthesisNotFound, REASON_SIZE_LIMIT
+import dsl
+
+class AsyncSynthesizer(Synthesizer):
+    """
+    Synthesis Cypher query on asyncio, without blocking the event loop
+
+    The search runs as a pipeline of concurrent stages connected by bounded queues:
+    1. enumerate candidates of each sketch (```chunk_size``` at a time on a worker thread,
+       since pruning evaluates prefixes in memory)
+    2. translate candidates to Cypher
+    3. validate candidates (```max_in_flight``` queries at once)
+
+    The result is the first valid candidate in enumeration order,
+    the same one Synthesizer.synthesize returns.
+    """
+    async_database: AsyncCypherDatabase
+    mode: str
+    max_in_flight: int
+    queue_size: int
+    chunk_size: int
+
+    def __init__(self, example: Union[Example, List[Example]], database: AsyncCypherDatabase = None,
+                 undirected_relations: bool = False, mode: str = MODE_FETCH, max_in_flight: int = 8,
+                 queue_size: int = 64, chunk_size: int = 64) -> None:
+        """
+        Candidates are validated on ```database``` (see CypherEvaluator for ```mode```),
+        or in memory on a worker thread if it is None.
+        With several examples, the database holds the first one,
+        and a candidate valid on it is validated on the other examples in memory.
+        """
+        if mode not in (MODE_FETCH, MODE_VERIFY):
+            raise RuntimeError(f"Illegall mode: {mode}")
+
+        super().__init__(example, undirected_relations=undirected_relations)
+        self.async_database = database
+        self.mode = mode
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+
+    async def synthesize(self, max_sketch_size: int = MAX_SKETCH_SIZE) -> str:
+        """
+        Main algorithm of the synthesizer, see Synthesizer.synthesize
+        (budgets and checkpoints are not supported, cancel the task to stop the search)
+        """
+        start = time.perf_counter()
+        sorted_target_result = self._prepare_search()
+
+        programs = asyncio.Queue(self.queue_size)  # (index, program), None at the end
+        queries = asyncio.Queue(self.queue_size)  # (index, program, (query, parameters)), None at the end
+        found = {}  # index -> valid program
+
+        stages = [asyncio.ensure_future(stage) for stage in [
+            self._enumerate_stage(max_sketch_size, programs, found),
+            self._translate_stage(programs, queries),
+            *[self._validate_stage(queries, found, sorted_target_result) for _ in range(self.max_in_flight)]]]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # the other stages would wait forever on the queues of a failed (or cancelled) one
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+
+        if found:
+            return dsl.translate(found[min(found)])  # found valid query
+
+        raise SynthesisNotFound(REASON_SIZE_LIMIT, self.num_sketches, self.num_candidates, self.num_queries,
+                                time.perf_counter() - start)
+
+    async def _enumerate_stage(self, max_sketch_size: int, programs: asyncio.Queue,
+                               found: Dict[int, List[dsl.DSL]]):
+        """
+        number the candidates of all sketches in order, stop once a valid one is found
+        """
+        candidates = self._all_candidates(max_sketch_size)
+        index = 0
+        while not found:
+            chunk = await asyncio.to_thread(list, islice(candidates, self.chunk_size))
+            if not chunk:
+                break
+
+            for program in chunk:
+                if found:
+                    break
+
+                await programs.put((index, program))
+                await asyncio.sleep(0)  # let the other stages run
+                index += 1
+
+        await programs.put(None)
+
+    def _all_candidates(self, max_sketch_size: int) -> Iterator[List[dsl.DSL]]:
+        """
+        candidates of all sketches in order (advanced on worker threads, one chunk at a time)
+        """
+        for sketch in self._sketches(max_sketch_size):
+            self.num_sketches += 1
+            yield from self._candidates(sketch)
+
+    async def _translate_stage(self, programs: asyncio.Queue, queries: asyncio.Queue):
+        while True:
+            item = await programs.get()
+            if item is None:
+                break
+
+            index, program = item
+            translated = None
+            if self.async_database is not None:
+                translated = dsl.translate_with_parameters(program, self.mode == MODE_VERIFY)
+            await queries.put((index, program, translated))
+
+        # stop every validator
+        for _ in range(self.max_in_flight):
+            await queries.put(None)
+
+    async def _validate_stage(self, queries: asyncio.Queue, found: Dict[int, List[dsl.DSL]],
+                              sorted_target_result: List[tuple]):
+        while True:
+            item = await queries.get()
+            if item is None:
+                break
+
+            index, program, translated = item
+            if found and index > min(found):
+                continue  # a candidate before it is valid
+
+            self.num_candidates += 1
+            if await self._matches(program, translated, sorted_target_result):
+                found[index] = program
+
+    async def _matches(self, program: List[dsl.DSL], translated: Optional[Tuple[str, Dict]],
+                       sorted_target_result: List[tuple]) -> bool:
+        if self.async_database is None:
+            # on every example (see Synthesizer._check_examples)
+            verdicts = await asyncio.to_thread(self._check_batch, [program], sorted_target_result)
+            return verdicts[0]
+
+        self._count_queries(1)
+        query, parameters = translated
+        if self.mode == MODE_VERIFY:
+            verdict = await self.async_database.verify(query, sorted_target_result, parameters)
+        else:
+            result = await self.async_database.query(query, parameters)
+            verdict = same_result([tuple(record.values()) for record in result], sorted_target_result)
+
+        if not verdict or len(self.examples) == 1:
+            return verdict
+
+        # the other examples are not in the database
+        return await asyncio.to_thread(self._matches_other_examples, program)
+
+    def _matches_other_examples(self, program: List[dsl.DSL]) -> bool:
+        """
+        run on a worker thread
+        """
+        for evaluator, sorted_target in zip(self.evaluators[1:], self.sorted_targets[1:]):
+            self._count_queries(1)
+            if not evaluator.matches(program, sorted_target):
+                return False
+        return True
@@ -0,0 +1,85 @@
+from typing import Optional
+import resource
+import time
+
+# reasons a search stops without a valid query
+REASON_SIZE_LIMIT = "program size limit"  # every sketch up to the size limit is checked
+REASON_WALL_CLOCK = "wall-clock budget"
+REASON_QUERIES = "query budget"
+REASON_MEMORY = "memory budget"
+
+class Budget:
+    """
+    Resource limits of a search, a limit of None is unlimited
+
+    ```seconds```: wall-clock time of the run
+    ```queries```: number of candidates validated by the evaluator in the run (known verdicts are free)
+    ```memory_mb```: peak resident memory of the process
+
+    A search resumed from a checkpoint is a new run with the whole budget.
+    """
+    seconds: Optional[float]
+    queries: Optional[int]
+    memory_mb: Optional[float]
+
+    def __init__(self, seconds: float = None, queries: int = None, memory_mb: float = None) -> None:
+        self.seconds = seconds
+        self.queries = queries
+        self.memory_mb = memory_mb
+        self.start_time = time.perf_counter()
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def exceeded(self, num_queries: int) -> Optional[str]:
+        """
+        the first exhausted limit, or None if the search could go on
+        """
+        if self.seconds is not None and self.elapsed() > self.seconds:
+            return REASON_WALL_CLOCK
+        if self.queries is not None and num_queries >= self.queries:
+            return REASON_QUERIES
+        if self.memory_mb is not None and peak_memory_mb() > self.memory_mb:
+            return REASON_MEMORY
+        return None
+
+
+def peak_memory_mb() -> float:
+    """
+    peak resident memory of this process (ru_maxrss is in KB on Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class SynthesisNotFound(Exception):
+    """
+    No valid query is found before the search stops
+
+    ```reason``` is one of the REASON_* constants.
+    If the search is stopped by its budget and a checkpoint path is given,
+    the search could be resumed from ```checkpoint_path```.
+    """
+    reason: str
+    num_sketches: int
+    num_candidates: int
+    num_queries: int
+    seconds: float
+    checkpoint_path: Optional[str]
+
+    def __init__(self, reason: str, num_sketches: int, num_candidates: int, num_queries: int,
+                 seconds: float, checkpoint_path: str = None) -> None:
+        self.reason = reason
+        self.num_sketches = num_sketches
+        self.num_candidates = num_candidates
+        self.num_queries = num_queries
+        self.seconds = seconds
+        self.checkpoint_path = checkpoint_path
+
+        message = (f"no query found within the {reason}: {num_sketches} sketches, "
+                   f"{num_candidates} candidates, {num_queries} queries in {seconds:.2f}s")
+        if checkpoint_path is not None:
+            message += f", resume from {checkpoint_path}"
+        super().__init__(message)
@@ -0,0 +1,63 @@
+from typing import List, Dict, Optional
+from pathlib import Path
+import pickle
+import os
+
+class Checkpoint:
+    """
+    The state of an interrupted search in a pickle file
+
+    {
+        "fingerprint": <fingerprint of the example(s)>,
+        "example_fingerprints": <fingerprint of each example, in the order given to the synthesizer>,
+        "max_sketch_size": <size limit of the search>,
+        "undirected_relations": <whether relations are matched in either direction>,
+        "sketch_index": <position of the current sketch in the sketch order>,
+        "cursor": <number of candidates of the current sketch already validated>,
+        "pruner": <pickled CandidatePruner state at the start of the current sketch>,
+        "num_sketches", "num_candidates", "num_queries", "seconds": <progress so far>
+    }
+
+    Sketches and their candidates are generated in a deterministic order
+    (given the order of the examples and the undirected_relations setting),
+    so a search is resumed by skipping the finished sketches,
+    restoring the pruner and replaying ```cursor``` candidates of the current sketch without validating them.
+    """
+    path: Path
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def load(self, fingerprint: str, example_fingerprints: List[str], max_sketch_size: int,
+             undirected_relations: bool) -> Optional[Dict]:
+        """
+        Return the saved state of a search on the same examples (in the same order)
+        with the same size limit and relation direction, or None
+        """
+        if not self.path.exists():
+            return None
+
+        with self.path.open("rb") as f:
+            state = pickle.load(f)
+
+        if state["fingerprint"] != fingerprint or state.get("example_fingerprints") != example_fingerprints \
+                or state["max_sketch_size"] != max_sketch_size \
+                or state.get("undirected_relations") != undirected_relations:
+            return None
+        return state
+
+    def save(self, state: Dict) -> None:
+        """
+        Save the state, the file is replaced at once so it is never half written
+        """
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        """
+        the search is finished, nothing to resume
+        """
+        if self.path.exists():
+            self.path.unlink()
@@ -1,13 +1,58 @@
+from typing import List, Dict, Tuple, Iterator
+from itertools import islice
+from collections import Counter
+from contextlib import contextmanager
+import threading
+import time
+
 from neo4j import GraphDatabase, Result
 from example_parser import Example
 from record import Node, Relation
+from metrics import Metrics, NULL_METRICS, PHASE_ROUND_TRIP, DATABASE_QUERIES
+
+ID_PROPERTY = "_id"  # example id of a node, only used to create relations
 
 class CypherDatabase:
     """
     A neo4j Cypher graph database
     """
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, max_connection_pool_size: int = 100, fetch_size: int = 1000,
+                 metrics: Metrics = None):
+        """
+        ```max_connection_pool_size``` connections are kept by the driver,
+        ```fetch_size``` records are fetched from the server at a time,
+        the latency of read transactions is recorded to ```metrics```
+        """
+        self.driver = GraphDatabase.driver(uri, auth=(user, password),
+                                           max_connection_pool_size=max_connection_pool_size)
+        self.fetch_size = fetch_size
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self._local = threading.local()  # session held by each thread, sessions are not thread safe
+
+    @contextmanager
+    def session(self):
+        """
+        Hold a session for the block, so all operations of this thread
+        in the block reuse it instead of opening a new session each time.
+
+        with database.session():
+            database.query(...)
+            database.query(...)
+        """
+        held = getattr(self._local, "session", None)
+        if held is not None:
+            yield held  # nested block, reuse the outer session
+            return
+
+        with self.driver.session(fetch_size=self.fetch_size) as session:
+            self._local.session = session
+            try:
+                yield session
+            finally:
+                # the block may be closed by another thread once this one is done
+                # (e.g. sessions of pool workers, see Synthesizer._worker_pool)
+                if getattr(self._local, "session", None) is session:
+                    self._local.session = None
 
     def close(self):
         self.driver.close()
@@ -16,8 +61,8 @@ class CypherDatabase:
         """
         delete all nodes and relations
         """
-        with self.driver.session() as session:
-            session.write_transaction(self._clear_all)
+        with self.session() as session:
+            session.execute_write(self._clear_all)
 
     @staticmethod
     def _clear_all(tx):
@@ -25,9 +70,9 @@ class CypherDatabase:
                "DETACH DELETE n")
 
     def print_all(self):
-        with self.driver.session() as session:
-            session.read_transaction(self._return_all_relations)
-            session.read_transaction(self._return_all_nodes)
+        with self.session() as session:
+            session.execute_read(self._return_all_relations)
+            session.execute_read(self._return_all_nodes)
 
     @staticmethod
     def _return_all_relations(tx):
@@ -47,47 +92,85 @@ class CypherDatabase:
         """
         create node in database from Node object
         """
-        with self.driver.session() as session:
-            session.write_transaction(self._create_node, node)
+        with self.session() as session:
+            session.execute_write(self._create_node, node)
 
     @staticmethod
     def _create_node(tx, node: Node):
-        tx.run(f"CREATE {node}")
+        tx.run(f"CREATE {node.str_with_parameter('', 'properties')}", properties=dict(node.properties))
 
     def create_relation(self, relation: Relation):
         """
         create relation in database from Relation object
         """
-        with self.driver.session() as session:
-            session.write_transaction(self._create_relation, relation)
+        with self.session() as session:
+            session.execute_write(self._create_relation, relation)
 
     @staticmethod
     def _create_relation(tx, relation: Relation):
-        tx.run(f"MATCH {relation.src_node.str_with_variable('src')}"
-               f"MATCH {relation.dst_node.str_with_variable('dst')}"
-               f"CREATE (src){relation.short_repr()}(dst)")
+        tx.run(f"MATCH {relation.src_node.str_with_parameter('src', 'src')} "
+               f"MATCH {relation.dst_node.str_with_parameter('dst', 'dst')} "
+               f"CREATE (src){relation.short_repr_with_parameter('', 'rel')}(dst)",
+               src=dict(relation.src_node.properties), dst=dict(relation.dst_node.properties),
+               rel=dict(relation.properties))
 
-    def create_database_from_example(self, example: Example) -> None:
+    def create_database_from_example(self, example: Example, batch_size: int = 1000) -> Tuple[int, float]:
         """
         Use input example to create a database
+
+        Nodes and relations are created in batches of ```batch_size``` rows (one UNWIND transaction per batch).
+        Each node keeps its example id in ```ID_PROPERTY``` (indexed),
+        which is used to find the endpoints of relations.
+        Return the number of nodes and relations created, and seconds it took
         """
-        for nodes in example.nodes.values():
-            for node in nodes:
-                self.create_node(node)
-        
-        for relations in example.relations.values():
-            for rel in relations:
-                self.create_relation(rel)
+        start = time.perf_counter()
+        num_rows = 0
+
+        with self.session() as session:
+            for label in example.nodes:
+                session.run(f"CREATE INDEX IF NOT EXISTS FOR (n:{label}) ON (n.{ID_PROPERTY})").consume()
+            session.run("CALL db.awaitIndexes()").consume()
+
+            for label, nodes in example.nodes.items():
+                rows = ({"id": node.id, "properties": dict(node.properties)} for node in nodes)
+                for batch in _batches(rows, batch_size):
+                    session.execute_write(self._create_nodes, label, batch)
+                    num_rows += len(batch)
+
+            for label, relations in example.relations.items():
+                src_label, dst_label = example.relation_endpoints[label]
+                rows = ({"src": rel.src_node.id, "dst": rel.dst_node.id, "properties": dict(rel.properties)}
+                        for rel in relations)
+                for batch in _batches(rows, batch_size):
+                    session.execute_write(self._create_relations, label, src_label, dst_label, batch)
+                    num_rows += len(batch)
 
-    def query(self, query: str):
+        return num_rows, time.perf_counter() - start
+
+    @staticmethod
+    def _create_nodes(tx, label: str, rows: List[Dict]):
+        tx.run(f"UNWIND $rows AS row "
+               f"CREATE (n:{label}) "
+               f"SET n = row.properties, n.{ID_PROPERTY} = row.id", rows=rows)
+
+    @staticmethod
+    def _create_relations(tx, label: str, src_label: str, dst_label: str, rows: List[Dict]):
+        tx.run(f"UNWIND $rows AS row "
+               f"MATCH (src:{src_label} {{{ID_PROPERTY}: row.src}}) "
+               f"MATCH (dst:{dst_label} {{{ID_PROPERTY}: row.dst}}) "
+               f"CREATE (src)-[r:{label}]->(dst) "
+               f"SET r = row.properties", rows=rows)
+
+    def query(self, query: str, parameters: Dict = None):
         """
         Execute a Cypher query, and return result
         Return None if query is invalid
         """
-        with self.driver.session() as session:
+        self.metrics.count(DATABASE_QUERIES)
+        with self.session() as session, self.metrics.timer(PHASE_ROUND_TRIP):
             # print("\nQuery:")
             # print(query)
-            result = session.read_transaction(self._query, query)
+            result = session.execute_read(self._query, query, parameters)
 
             # for record in result:
             #     print(record)
@@ -95,6 +178,101 @@ class CypherDatabase:
             
             
     @staticmethod
-    def _query(tx, query: str):
-        result = tx.run(query)
-        return [record for record in result]
\ No newline at end of file
+    def _query(tx, query: str, parameters: Dict = None):
+        result = tx.run(query, parameters)
+        return [record for record in result]
+
+    def query_batch(self, query: str, parameters: Dict, num_queries: int) -> List[List[tuple]]:
+        """
+        Execute ```num_queries``` queries translated to one Cypher query (see dsl.translate_batch)
+        in a single round trip, and return the rows of each query
+        """
+        self.metrics.count(DATABASE_QUERIES)
+        with self.session() as session, self.metrics.timer(PHASE_ROUND_TRIP):
+            records = session.execute_read(self._query, query, parameters)
+
+        rows = [[] for _ in range(num_queries)]
+        for record in records:
+            rows[record["query"]].append(tuple(record["row"]))
+        return rows
+
+    def verify(self, query: str, expected: List[tuple], parameters: Dict = None) -> bool:
+        """
+        Execute a verification query (see dsl.Return.to_verification_Cypher),
+        the server compares the result with ```expected``` and only the verdict comes back
+        """
+        result = self.query(query, {**(parameters or {}), **verification_parameters(expected)})
+        return result[0]["verdict"]
+
+    def verify_batch(self, query: str, expected: List[tuple], parameters: Dict, num_queries: int) -> List[bool]:
+        """
+        verify() on ```num_queries``` verification queries translated to one Cypher query
+        (see dsl.translate_batch), in a single round trip
+        """
+        verdicts = [False] * num_queries
+        for record in self.query(query, {**parameters, **verification_parameters(expected)}):
+            verdicts[record["query"]] = record["verdict"]
+        return verdicts
+
+    def query_streaming(self, query: str, expected: List[tuple], parameters: Dict = None) -> bool:
+        """
+        Execute a Cypher query and consume the result row by row,
+        return whether the result is ```expected``` (as multisets).
+
+        Stop as soon as a row is not expected (an unknown row, or more rows than ```expected```),
+        the rest of the result is discarded without fetching it.
+        """
+        return self.query_streaming_batch([query], expected, [parameters])[0]
+
+    def query_streaming_batch(self, queries: List[str], expected: List[tuple],
+                              parameters: List[Dict] = None) -> List[bool]:
+        """
+        query_streaming() on several queries in one read transaction
+        (each query is still a round trip, since its result is consumed before the next one is sent)
+        """
+        self.metrics.count(DATABASE_QUERIES, len(queries))
+        with self.session() as session, self.metrics.timer(PHASE_ROUND_TRIP):
+            return session.execute_read(self._query_streaming_batch, queries, expected, parameters)
+
+    @staticmethod
+    def _query_streaming_batch(tx, queries: List[str], expected: List[tuple],
+                               parameters: List[Dict] = None) -> List[bool]:
+        parameters = parameters or [None] * len(queries)
+
+        verdicts = []
+        for query, query_parameters in zip(queries, parameters):
+            result = tx.run(query, query_parameters)
+            remaining = Counter(expected)  # expected rows not seen yet
+
+            verdict = True
+            for record in result:
+                row = tuple(record.values())
+                if remaining[row] <= 0:
+                    verdict = False
+                    break
+                remaining[row] -= 1
+
+            result.consume()  # discard the rest
+            verdicts.append(verdict and not +remaining)  # every expected row is seen
+
+        return verdicts
+
+
+def verification_parameters(expected: List[tuple]) -> Dict:
+    """
+    parameters of a verification query (see dsl.Return.to_verification_Cypher):
+    the distinct ```expected``` rows with their counts, grouped here once instead of by every query
+    """
+    return {"expected": [[list(row), count] for row, count in Counter(expected).items()],
+            "limit": len(expected) + 1}
+
+
+def _batches(rows: Iterator, batch_size: int) -> Iterator[list]:
+    """
+    split ```rows``` to lists of ```batch_size```
+    """
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -1,7 +1,9 @@
-from typing import List
+from typing import List, Set, Dict, Tuple
 from unittest.util import strclass
 import abc
 
+from record import quote
+
 class DSL:
     """
     A Domain Specific Language for AutoCypher.
@@ -24,6 +26,20 @@ class DSL:
     def to_Cypher(self) -> str:
         raise NotImplementedError("Please Implement this method")
 
+    @abc.abstractmethod
+    def key(self) -> tuple:
+        """
+        A hashable normal form of the statement.
+        Two statements are the same iff they have the same key.
+        """
+        raise NotImplementedError("Please Implement this method")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DSL) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
 
 class Node(DSL):
     """
@@ -41,6 +57,9 @@ class Node(DSL):
     def __repr__(self) -> str:
         return f"<Node {self.variable} {self.label}>"
 
+    def key(self) -> tuple:
+        return ("Node", self.variable, self.label)
+
     def to_Cypher(self) -> str:
         return f"({self.variable}:{self.label})"
 
@@ -52,17 +71,29 @@ class Relation(DSL):
 
     Corresponding Cypher:
     -[variable:label]->
+    or if not directed (match in either direction):
+    -[variable:label]-
     """
-    def __init__(self, label: str, variable: str) -> None:
+    def __init__(self, label: str, variable: str, directed: bool = True) -> None:
         super().__init__()
         self.label = label
         self.variable = variable
+        self.directed = directed
 
     def __repr__(self) -> str:
-        return f"<Rel {self.variable} {self.label}>"
+        if self.directed:
+            return f"<Rel {self.variable} {self.label}>"
+        else:
+            return f"<Rel {self.variable} {self.label} undirected>"
+
+    def key(self) -> tuple:
+        return ("Relation", self.variable, self.label, self.directed)
 
     def to_Cypher(self) -> str:
-        return  f"-[{self.variable}:{self.label}]->"
+        if self.directed:
+            return  f"-[{self.variable}:{self.label}]->"
+        else:
+            return  f"-[{self.variable}:{self.label}]-"
 
 
 class Match(DSL):
@@ -85,6 +116,21 @@ class Match(DSL):
         else:
             return f"<Match {self.node}>"
 
+    def variables(self) -> Set[str]:
+        """
+        variables introduced by this Match
+        """
+        if self.relation is not None:
+            return {self.node.variable, self.relation.variable, self.node2.variable}
+        else:
+            return {self.node.variable}
+
+    def key(self) -> tuple:
+        if self.relation is not None:
+            return ("Match", self.node.key(), self.relation.key(), self.node2.key())
+        else:
+            return ("Match", self.node.key())
+
     def to_Cypher(self) -> str:
         if self.relation is not None:
             return f"MATCH {self.node.to_Cypher()}{self.relation.to_Cypher()}{self.node2.to_Cypher()}"
@@ -113,16 +159,70 @@ class Return(DSL):
         tmp = [var + " " + val for var, val in zip(self.variables, self.properties)]
         return f"<Return {' '.join(tmp)}>"
 
-    def to_Cypher(self) -> str:
+    def key(self) -> tuple:
+        return ("Return", tuple(zip(self.variables, self.properties)))
+
+    def to_Cypher(self, tag: int = None) -> str:
+        """
+        if ```tag``` is not None, the rows are returned as a list tagged by it (see translate_batch):
+        RETURN <tag> AS query, [<variable1>.<property1>, ...] AS row
+        """
         with_str = "WITH *"
         tmp = [var + "." + val for var, val in zip(self.variables, self.properties)]
-        return_str = f"RETURN {', '.join(tmp)}"
+        if tag is None:
+            return_str = f"RETURN {', '.join(tmp)}"
+        else:
+            return_str = f"RETURN {tag} AS query, [{', '.join(tmp)}] AS row"
 
         tmp2 = [s + " IS NOT NULL" for s in tmp]
         checking_str = f"WHERE {' AND '.join(tmp2)}"
 
         return with_str + '\n' + checking_str + '\n' + return_str
 
+    def to_verification_Cypher(self, tag: int = None) -> str:
+        """
+        Instead of returning the rows, compare them with the expected rows on the server.
+        Only a single boolean ```verdict``` is returned (tagged by ```tag``` if it is not None, see translate_batch).
+
+        Parameters:
+        $expected: the distinct expected rows and their counts, [[<row as a list of values>, <count>], ...]
+        $limit: number of expected rows + 1, stop collecting rows once there are too many
+
+        Corresponding Cypher:
+        WITH *
+        WHERE <variable1>.<property1> IS NOT NULL AND ...
+        WITH [<variable1>.<property1>, ...] AS row
+        LIMIT $limit
+        WITH row, count(*) AS count
+        WITH collect([row, count]) AS rows
+        UNWIND rows + [e IN $expected | [e[0], -e[1]]] AS r
+        WITH r[0] AS row, sum(r[1]) AS difference
+        RETURN all(d IN collect(difference) WHERE d = 0) AS verdict
+
+        The result and the expected rows are grouped by the server (hash aggregation),
+        each row of them is looked at a constant number of times.
+        The rows are the same multiset iff the count of each distinct row minus its expected count is 0.
+        With no column, the WHERE line is left out and every row is [].
+        """
+        with_str = "WITH *"
+        tmp = [var + "." + val for var, val in zip(self.variables, self.properties)]
+
+        tmp2 = [s + " IS NOT NULL" for s in tmp]
+        checking_str = f"WHERE {' AND '.join(tmp2)}\n" if tmp2 else ""
+
+        collect_str = (f"WITH [{', '.join(tmp)}] AS row\nLIMIT $limit\n"
+                       "WITH row, count(*) AS count\n"
+                       "WITH collect([row, count]) AS rows")
+
+        # count of each distinct row in the result minus its count in $expected
+        difference_str = ("UNWIND rows + [e IN $expected | [e[0], -e[1]]] AS r\n"
+                          "WITH r[0] AS row, sum(r[1]) AS difference")
+
+        tag_str = f"{tag} AS query, " if tag is not None else ""
+        verdict_str = f"RETURN {tag_str}all(d IN collect(difference) WHERE d = 0) AS verdict"
+
+        return with_str + '\n' + checking_str + collect_str + '\n' + difference_str + '\n' + verdict_str
+
 class Condition(DSL):
     """
     Condtions on properties
@@ -144,6 +244,8 @@ class EqualTo(Condition):
 
     Corresponding Cypher:
     <variable>.<property> = "<constant>"
+    or with parameters:
+    <variable>.<property> = $c<number>
     """
     def __init__(self, property: str, variable: str, constant: str) -> None:
         super().__init__()
@@ -154,8 +256,20 @@ class EqualTo(Condition):
     def __repr__(self) -> str:
         return f"<EqualTo {self.variable} {self.property} {self.constant}>"
 
-    def to_Cypher(self) -> str:
-        return f'{self.variable}.{self.property} = "{self.constant}"'
+    def key(self) -> tuple:
+        return ("EqualTo", self.variable, self.property, self.constant)
+
+    def to_Cypher(self, parameters: Dict[str, str] = None) -> str:
+        """
+        if ```parameters``` is not None, the constant is added to it
+        and the query refers to it as a parameter
+        """
+        if parameters is None:
+            return f'{self.variable}.{self.property} = {quote(self.constant)}'
+
+        name = f"c{len(parameters)}"
+        parameters[name] = self.constant
+        return f'{self.variable}.{self.property} = ${name}'
 
 class Require(DSL):
     """
@@ -181,17 +295,82 @@ class Require(DSL):
     def __repr__(self) -> str:
         return f"<Require {self.condition}>"
 
-    def to_Cypher(self, other_requires: List["Require"] = None) -> str:
+    def key(self) -> tuple:
+        return ("Require", self.condition.key())
+
+    def to_Cypher(self, other_requires: List["Require"] = None, parameters: Dict[str, str] = None) -> str:
         """
         Since we need to combine multiple Require to one WHERE statement
         if ```other_requires``` is not None,
         they will be translate to AND clause following this Require statement
+
+        if ```parameters``` is not None, constants are passed as parameters (see EqualTo)
         """
         with_str = "WITH *"
-        where_str = "WHERE " + self.condition.to_Cypher()
+        where_str = "WHERE " + self.condition.to_Cypher(parameters)
 
         if other_requires:
             for require in other_requires:
-                where_str += " AND " + require.condition.to_Cypher()
+                where_str += " AND " + require.condition.to_Cypher(parameters)
         
-        return with_str + "\n" + where_str
\ No newline at end of file
+        return with_str + "\n" + where_str
+
+def translate(program: List[DSL], verification: bool = False, parameters: Dict[str, str] = None,
+              tag: int = None) -> str:
+    """
+    Translate a completed DSL program to a Cypher query
+    if ```verification```, the query only returns whether the result is expected
+    (see Return.to_verification_Cypher)
+    if ```parameters``` is not None, constants are added to it instead of inlined in the query
+    if ```tag``` is not None, the result is tagged by it (see translate_batch)
+    """
+    last = program[-1]
+    last_Cypher = last.to_verification_Cypher(tag) if verification else last.to_Cypher(tag)
+
+    cypher_statements = []
+    for i, statement in enumerate(program[:-1]):
+        if isinstance(statement, Require):
+            # for multiple Require statements
+            # combine them into one
+            cypher_statements.append(statement.to_Cypher(program[i+1:-1], parameters))
+            break
+        else:
+            cypher_statements.append(statement.to_Cypher())
+    cypher_statements.append(last_Cypher)
+
+    return "\n".join(cypher_statements)
+
+def translate_with_parameters(program: List[DSL], verification: bool = False) -> Tuple[str, Dict[str, str]]:
+    """
+    Translate a completed DSL program to a Cypher query template and its parameters.
+    Programs that only differ in constants have the same template,
+    so the database could reuse the cached query plan.
+    """
+    parameters = {}
+    query = translate(program, verification, parameters)
+    return query, parameters
+
+def translate_batch(programs: List[List[DSL]], verification: bool = False) -> Tuple[str, Dict[str, str]]:
+    """
+    Translate several completed DSL programs to one Cypher query and its parameters,
+    so all of them are run in a single round trip.
+
+    Each program is a branch of a UNION ALL subquery, and its rows are tagged by its index:
+    CALL {
+    <program 0, ending with RETURN 0 AS query, [...] AS row>
+    UNION ALL
+    <program 1, ending with RETURN 1 AS query, [...] AS row>
+    ...
+    }
+    RETURN query, row
+
+    if ```verification```, each branch returns ```query``` and its ```verdict``` instead.
+    The text depends on every program of the batch, so it is less likely to hit the query plan cache
+    than translate_with_parameters.
+    """
+    parameters = {}  # shared, so constants of different programs get different names
+    branches = [translate(program, verification, parameters, i) for i, program in enumerate(programs)]
+    result_str = "RETURN query, verdict" if verification else "RETURN query, row"
+
+    query = "CALL {\n" + "\nUNION ALL\n".join(branches) + "\n}\n" + result_str
+    return query, parameters
@@ -0,0 +1,142 @@
+from typing import List, Tuple, FrozenSet
+
+import dsl
+
+# pruning rules, applied in this order
+RULE_SCHEMA = "schema"  # Match only patterns allowed by relation endpoints
+RULE_CONSTANTS = "constants"  # Require only EqualTo conditions that match some row
+RULE_PROVENANCE = "provenance"  # Return only columns containing the output
+RULES = [RULE_SCHEMA, RULE_CONSTANTS, RULE_PROVENANCE]
+
+class SearchSpaceEstimator:
+    """
+    Number of candidates of a sketch, computed analytically
+    without completing the sketch.
+
+    Candidates are counted by the set of variables they bind:
+    Match adds variables, Require and Return only pick from them.
+    So the count only needs one entry per distinct variable set.
+
+    Pruning done during the search (equivalent programs, see pruning.py)
+    depends on evaluation results, so it is not counted.
+
+    The cost of a sketch also weights each candidate by the rows its Match statements bind,
+    estimated from the table sizes: a Match multiplies the rows by the rows of its pattern,
+    divided by the rows of the variables it shares with the previous statements
+    (the join is assumed independent of the shared variables).
+    """
+    def __init__(self, synthesizer: "Synthesizer") -> None:
+        self.synthesizer = synthesizer
+
+        # every Match without the schema rule: a single node, or any node x relation x node
+        self.all_matches = []
+        for node in synthesizer.dsl_nodes:
+            self.all_matches.append(dsl.Match(node))
+            for rel in synthesizer.dsl_relations:
+                for node2 in synthesizer.dsl_nodes:
+                    self.all_matches.append(dsl.Match(node, rel, node2))
+
+    def count(self, sketch: List[dsl.DSL.__subclasses__], rules: List[str] = RULES) -> int:
+        """
+        number of candidates of ```sketch``` when ```rules``` are applied
+        """
+        return self._estimate(sketch, rules)[0]
+
+    def cost(self, sketch: List[dsl.DSL.__subclasses__]) -> float:
+        """
+        estimated cost of validating all candidates of ```sketch``` (every rule applied):
+        the sum of the estimated rows bound by each candidate, plus one per candidate
+        """
+        return self._estimate(sketch, RULES)[1]
+
+    def _estimate(self, sketch: List[dsl.DSL.__subclasses__], rules: List[str]) -> Tuple[int, float]:
+        """
+        number of candidates and their cost
+        """
+        synthesizer = self.synthesizer
+        matches = synthesizer.dsl_matches if RULE_SCHEMA in rules else self.all_matches
+
+        # variable set -> (number of partial programs, sum of their estimated rows)
+        counts = {frozenset(): (1, 1.0)}
+        for dsl_class in sketch:
+            next_counts = {}
+
+            if dsl_class == dsl.Match:
+                for variables, (count, rows) in counts.items():
+                    for match in matches:
+                        new_variables = variables | match.variables()
+                        new_count, new_rows = next_counts.get(new_variables, (0, 0.0))
+                        next_counts[new_variables] = (new_count + count,
+                                                      new_rows + rows * self._join_factor(variables, match))
+            elif dsl_class == dsl.Require:
+                for variables, (count, rows) in counts.items():
+                    num_EqualTo = sum(self._num_EqualTo(v, rules) for v in variables)
+                    next_counts[variables] = (count * num_EqualTo, rows * num_EqualTo)
+            elif dsl_class == dsl.Return:
+                total = 0
+                cost = 0.0
+                for variables, (count, rows) in counts.items():
+                    num_returns = 1
+                    for i, property in enumerate(synthesizer.fixed_Return_statement.properties):
+                        num_returns *= sum(self._returnable(v, i, property, rules) for v in variables)
+                    total += count * num_returns
+                    cost += (count + rows) * num_returns
+                return total, cost
+            else:
+                raise RuntimeError(f"Illegall DSL: {dsl_class}")
+
+            counts = next_counts
+
+        return 0, 0.0  # a sketch without Return has no candidate
+
+    def _join_factor(self, variables: FrozenSet[str], match: dsl.Match) -> float:
+        """
+        estimated rows after ```match``` per row bound to ```variables``` before it
+        """
+        if match.relation is None:
+            rows = self._rows(match.node.variable)
+        else:
+            rows = self._rows(match.relation.variable) * (1 if match.relation.directed else 2)
+
+        for variable in match.variables() & variables:
+            shared_rows = self._rows(variable)
+            if shared_rows == 0:
+                return 0.0
+            rows /= shared_rows
+        return rows
+
+    def _rows(self, variable: str) -> int:
+        """
+        rows of the label of ```variable``` in all examples
+        """
+        label = self.synthesizer.variable_to_label[variable]
+        return sum(example.row_count(label) for example in self.synthesizer.examples)
+
+    def count_by_rule(self, sketch: List[dsl.DSL.__subclasses__]) -> List[Tuple[str, int]]:
+        """
+        number of candidates before any rule, and after each rule (applied cumulatively)
+        """
+        counts = [("none", self.count(sketch, []))]
+        for i, rule in enumerate(RULES):
+            counts.append((rule, self.count(sketch, RULES[:i + 1])))
+        return counts
+
+    def _num_EqualTo(self, variable: str, rules: List[str]) -> int:
+        """
+        number of EqualTo conditions on ```variable``` (see Synthesizer._possible_EqualTo)
+        """
+        synthesizer = self.synthesizer
+        label = synthesizer.variable_to_label[variable]
+
+        num = 0
+        for property in synthesizer.labels_to_properties[label]:
+            for constant in synthesizer.constants:
+                if RULE_CONSTANTS in rules and synthesizer.classify_EqualTo(label, property, constant) is None:
+                    continue
+                num += 1
+        return num
+
+    def _returnable(self, variable: str, index: int, property: str, rules: List[str]) -> bool:
+        if RULE_PROVENANCE not in rules:
+            return True
+        return self.synthesizer.provenance.allows(index, self.synthesizer.variable_to_label[variable], property)
@@ -0,0 +1,418 @@
+from typing import List, Dict, Tuple, Optional, Sequence, ContextManager
+from contextlib import nullcontext
+from collections import OrderedDict
+from array import array
+from itertools import chain
+from math import prod
+import threading
+import hashlib
+import abc
+
+from example_parser import Example
+from database import CypherDatabase
+from table import Table
+from metrics import Metrics, NULL_METRICS, PHASE_TRANSLATION, PHASE_QUERY, PHASE_COMPARISON
+import dsl
+
+class Evaluator:
+    """
+    A backend that runs completed DSL programs.
+
+    The synthesizer only needs to know whether a program produces the
+    expected output, so every backend returns the result rows as tuples.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    # number of candidates the synthesizer sends to check_batch at once
+    batch_size = 1
+
+    # whether checking waits on I/O (e.g. a database) rather than running Python,
+    # only then several worker threads could check batches at the same time (see Synthesizer)
+    io_bound = False
+
+    # where the query and comparison phases are timed
+    metrics = NULL_METRICS
+
+    @abc.abstractmethod
+    def evaluate(self, program: List[dsl.DSL]) -> List[tuple]:
+        raise NotImplementedError("Please Implement this method")
+
+    def session(self) -> ContextManager:
+        """
+        Resources (e.g. a database session) held by the synthesizer for a whole search
+        """
+        return nullcontext()
+
+    def check(self, program: List[dsl.DSL], sorted_target_result: List[tuple]) -> Tuple[bool, Optional[int]]:
+        """
+        Check whether ```program``` returns exactly ```sorted_target_result```
+        (compared as multisets, the target should be sorted)
+        Return the verdict, and the number of rows of the result (None if unknown)
+        """
+        with self.metrics.timer(PHASE_QUERY):
+            result = self.evaluate(program)
+        with self.metrics.timer(PHASE_COMPARISON):
+            verdict = same_result(result, sorted_target_result)
+        return verdict, len(result)
+
+    def check_batch(self, programs: List[List[dsl.DSL]],
+                    sorted_target_result: List[tuple]) -> List[Tuple[bool, Optional[int]]]:
+        """
+        check() on each program
+        """
+        return [self.check(program, sorted_target_result) for program in programs]
+
+    def matches(self, program: List[dsl.DSL], sorted_target_result: List[tuple]) -> bool:
+        """
+        the verdict of check()
+        """
+        return self.check(program, sorted_target_result)[0]
+
+    def matches_batch(self, programs: List[List[dsl.DSL]], sorted_target_result: List[tuple]) -> List[bool]:
+        """
+        the verdicts of check_batch()
+        """
+        return [verdict for verdict, _ in self.check_batch(programs, sorted_target_result)]
+
+
+def same_result(result: List[tuple], sorted_target_result: List[tuple]) -> bool:
+    """
+    compare a result with the sorted target as multisets
+    """
+    if len(result) != len(sorted_target_result):
+        return False
+
+    return sorted(result) == sorted_target_result
+
+
+# how CypherEvaluator checks a candidate
+MODE_FETCH = "fetch"  # fetch all rows and compare them locally
+MODE_VERIFY = "verify"  # compare on the server, only the verdict is fetched
+MODE_STREAM = "stream"  # fetch rows one by one, stop at the first unexpected row
+
+class CypherEvaluator(Evaluator):
+    """
+    Translate the program to Cypher and run it on a neo4j database
+    """
+    io_bound = True
+
+    def __init__(self, database: CypherDatabase, batch_size: int = 1, mode: str = MODE_FETCH,
+                 metrics: Metrics = None) -> None:
+        """
+        ```batch_size``` candidates are validated in one round trip (one query, see dsl.translate_batch;
+        in stream mode they share a transaction, but each one is a round trip).
+        The phases are recorded to ```metrics``` (the one of ```database``` by default)
+        """
+        if mode not in (MODE_FETCH, MODE_VERIFY, MODE_STREAM):
+            raise RuntimeError(f"Illegall mode: {mode}")
+
+        self.database = database
+        self.batch_size = batch_size
+        self.mode = mode
+        self.metrics = metrics if metrics is not None else database.metrics
+
+    def session(self) -> ContextManager:
+        return self.database.session()
+
+    def evaluate(self, program: List[dsl.DSL]) -> List[tuple]:
+        result = self.database.query(*dsl.translate_with_parameters(program))
+        return [tuple(record.values()) for record in result]
+
+    def check(self, program: List[dsl.DSL], sorted_target_result: List[tuple]) -> Tuple[bool, Optional[int]]:
+        return self.check_batch([program], sorted_target_result)[0]
+
+    def check_batch(self, programs: List[List[dsl.DSL]],
+                    sorted_target_result: List[tuple]) -> List[Tuple[bool, Optional[int]]]:
+        # constants are passed as parameters, so candidates share cached query plans
+        with self.metrics.timer(PHASE_TRANSLATION):
+            if self.mode == MODE_STREAM:
+                translated = [dsl.translate_with_parameters(program) for program in programs]
+            else:
+                query, parameters = dsl.translate_batch(programs, self.mode == MODE_VERIFY)
+
+        # the number of rows is unknown if the result is not fetched
+        # (verify and stream modes compare while querying)
+        if self.mode == MODE_VERIFY:
+            with self.metrics.timer(PHASE_QUERY):
+                verdicts = self.database.verify_batch(query, sorted_target_result, parameters, len(programs))
+            return [(verdict, None) for verdict in verdicts]
+        elif self.mode == MODE_STREAM:
+            with self.metrics.timer(PHASE_QUERY):
+                verdicts = self.database.query_streaming_batch([query for query, _ in translated],
+                                                               sorted_target_result,
+                                                               [parameters for _, parameters in translated])
+            return [(verdict, None) for verdict in verdicts]
+
+        with self.metrics.timer(PHASE_QUERY):
+            results = self.database.query_batch(query, parameters, len(programs))
+        with self.metrics.timer(PHASE_COMPARISON):
+            return [(same_result(result, sorted_target_result), len(result)) for result in results]
+
+
+# at most this many rows are gathered by a single C call,
+# so a thread evaluating a large program still lets other threads (e.g. an event loop) run
+CHUNK_ROWS = 65536
+
+class Bindings:
+    """
+    A table of bindings of ```variables```, stored by column:
+    ```columns[i][k]``` is the row (in the table of its label) bound to ```variables[i]``` by the k-th binding.
+    A table without variables has ```size``` empty bindings.
+    """
+    __slots__ = ("variables", "columns", "size")
+    variables: Tuple[str, ...]
+    columns: List[array]
+    size: int
+
+    def __init__(self, variables: Tuple[str, ...], columns: List[array], size: int = None) -> None:
+        self.variables = variables
+        self.columns = columns
+        self.size = len(columns[0]) if columns else size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def column(self, variable: str) -> array:
+        return self.columns[self.variables.index(variable)]
+
+    def take(self, indexes: Sequence[int]) -> "Bindings":
+        """
+        the bindings at ```indexes```, in that order
+        """
+        if not self.columns:
+            return Bindings((), [], len(indexes))
+        return Bindings(self.variables, [_gather(column, indexes) for column in self.columns])
+
+
+class InMemoryEvaluator(Evaluator):
+    """
+    Run the program directly on the columns of the parsed Example graph.
+
+    A binding maps each variable to a row of the table of its label,
+    bindings are stored by column (see Bindings).
+    Each Match is evaluated as a hash join between the current bindings
+    and the rows of the pattern, keyed on the variables they share.
+    Require and Return compare and read interned value ids of the columns (see table.py).
+
+    The bindings of each distinct set of Match statements are kept in a LRU cache
+    (at most ```cache_rows``` bindings in total), so a program extending a previous one
+    only joins its new Match, and Require/Return are applied to the cached bindings.
+    """
+    example: Example
+    cache_rows: int
+    match_cache: "OrderedDict[frozenset, Bindings]"
+
+    def __init__(self, example: Example, cache_rows: int = 1000000, metrics: Metrics = None) -> None:
+        self.example = example
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.cache_rows = cache_rows
+        self.match_cache = OrderedDict()
+        self._cached_rows = 0  # bindings held by match_cache
+        self._cache_lock = threading.Lock()  # evaluated on worker threads in parallel search
+
+    def evaluate(self, program: List[dsl.DSL]) -> List[tuple]:
+        if not program or not isinstance(program[-1], dsl.Return):
+            raise RuntimeError("Program should end with a Return statement")
+
+        prefix = program[:-1]
+        return self._project(self.bindings(prefix), program[-1], self._variable_tables(prefix))
+
+    def bindings(self, prefix: List[dsl.DSL]) -> Bindings:
+        """
+        all bindings of the Match/Require statements in ```prefix```
+        """
+        matches = []
+        requires = []
+        for statement in prefix:
+            if isinstance(statement, dsl.Match):
+                matches.append(statement)
+            elif isinstance(statement, dsl.Require):
+                requires.append(statement)
+            else:
+                raise RuntimeError(f"Illegall DSL: {statement}")
+
+        bindings = self._match_bindings(matches)
+        if requires and bindings:
+            tables = self._variable_tables(matches)
+            for require in requires:
+                bindings = self._filter(bindings, require.condition, tables)
+
+        return bindings
+
+    def _match_bindings(self, matches: List[dsl.Match]) -> Bindings:
+        """
+        bindings of Match statements, cached on the set of statements
+        (the order and repetition of Match statements do not change the bindings)
+        """
+        if not matches:
+            return Bindings((), [], 1)
+
+        key = frozenset(matches)
+        with self._cache_lock:
+            bindings = self.match_cache.get(key)
+            if bindings is not None:
+                self.match_cache.move_to_end(key)
+                return bindings
+
+        # extend the bindings of the previous statements (likely cached) with the last one
+        bindings = self._join(self._match_bindings(matches[:-1]), self._match_rows(matches[-1]))
+        if len(bindings) > self.cache_rows:
+            return bindings  # would evict everything else
+
+        with self._cache_lock:
+            if key not in self.match_cache:
+                self.match_cache[key] = bindings
+                self._cached_rows += len(bindings)
+            while self._cached_rows > self.cache_rows:
+                _, evicted = self.match_cache.popitem(last=False)
+                self._cached_rows -= len(evicted)
+
+        return bindings
+
+    def bindings_signature(self, prefix: List[dsl.DSL]) -> bytes:
+        """
+        A fixed size digest (sha256) of the bindings of ```prefix```, as a set of rows of each variable.
+        Two prefixes with the same signature give the same result for any Return.
+        """
+        tables = self._variable_tables(prefix)
+        bindings = self.bindings(prefix)
+        variables = sorted(bindings.variables)
+
+        # a variable without table (a label not in the example) has no binding
+        labels = [(var, tables[var].label if tables[var] is not None else None) for var in variables]
+        digest = hashlib.sha256(repr(labels).encode("utf-8"))
+        columns = [bindings.column(var) for var in variables]
+        sizes = [len(tables[var] or []) for var in variables]
+        if columns and prod(sizes) < 2 ** 63:
+            # each binding as one integer (mixed radix of the rows), faster to sort than tuples
+            keys = list(columns[0])
+            for column, size in zip(columns[1:], sizes[1:]):
+                keys = [key * size + row for key, row in zip(keys, column)]
+            keys.sort()
+            digest.update(array("q", keys).tobytes())
+        else:
+            digest.update(array("i", chain.from_iterable(sorted(zip(*columns)))).tobytes())
+        return digest.digest()
+
+    def _variable_tables(self, prefix: List[dsl.DSL]) -> Dict[str, Table]:
+        """
+        the table of each variable introduced by the Match statements in ```prefix```
+        (None if the example has no such label, then the variable has no binding)
+        """
+        tables = {}
+        for statement in prefix:
+            if isinstance(statement, dsl.Match):
+                tables[statement.node.variable] = self.example.nodes.get(statement.node.label)
+                if statement.relation is not None:
+                    tables[statement.relation.variable] = self.example.relations.get(statement.relation.label)
+                    tables[statement.node2.variable] = self.example.nodes.get(statement.node2.label)
+        return tables
+
+    def _match_rows(self, match: dsl.Match) -> Bindings:
+        """
+        all bindings of a single Match pattern
+        """
+        if match.relation is None:
+            table = self.example.nodes.get(match.node.label)
+            return Bindings((match.node.variable,), [array("i", range(len(table) if table is not None else 0))])
+
+        variables = (match.node.variable, match.relation.variable, match.node2.variable)
+        table = self.example.relations.get(match.relation.label)
+        if table is None:
+            return Bindings(variables, [array("i"), array("i"), array("i")])
+
+        src_label, dst_label = table.src_table.label, table.dst_table.label
+        src_rows, rel_rows, dst_rows = array("i"), array("i"), array("i")
+        if src_label == match.node.label and dst_label == match.node2.label:
+            src_rows.extend(table.src_rows)
+            rel_rows.extend(range(len(table)))
+            dst_rows.extend(table.dst_rows)
+        if not match.relation.directed and dst_label == match.node.label and src_label == match.node2.label:
+            # (a)-[r]-(b) matches both directions, a self loop is only matched once
+            same_table = table.src_table is table.dst_table
+            reverse = [rel for rel, (src, dst) in enumerate(zip(table.src_rows, table.dst_rows))
+                       if not (same_table and src == dst)]
+            src_rows.extend(map(table.dst_rows.__getitem__, reverse))
+            rel_rows.extend(reverse)
+            dst_rows.extend(map(table.src_rows.__getitem__, reverse))
+
+        bindings = Bindings(variables, [src_rows, rel_rows, dst_rows])
+        if match.node.variable == match.node2.variable:
+            # (n)-[r]->(n) is a self loop
+            loops = [k for k, (src, dst) in enumerate(zip(src_rows, dst_rows)) if src == dst]
+            bindings = Bindings(variables[:2], [src_rows, rel_rows]).take(loops)
+
+        return bindings
+
+    @staticmethod
+    def _join(bindings: Bindings, rows: Bindings) -> Bindings:
+        """
+        hash join two binding tables on their shared variables
+        """
+        if not bindings.variables and len(bindings) == 1:
+            return rows
+        shared = [v for v in rows.variables if v in bindings.variables]
+        new = [v for v in rows.variables if v not in bindings.variables]
+        if not bindings or not rows:
+            return Bindings(bindings.variables + tuple(new), [array("i") for _ in bindings.variables + tuple(new)])
+
+        table = {}
+        for k, key in enumerate(zip(*(rows.column(v) for v in shared)) if shared else [()] * len(rows)):
+            table.setdefault(key, []).append(k)
+
+        # pairs of joined bindings (index in bindings, index in rows)
+        left, right = array("i"), array("i")
+        for i, key in enumerate(zip(*(bindings.column(v) for v in shared)) if shared else [()] * len(bindings)):
+            matched = table.get(key)
+            if matched:
+                left.extend([i] * len(matched))
+                right.extend(matched)
+
+        return Bindings(bindings.variables + tuple(new),
+                        [_gather(column, left) for column in bindings.columns]
+                        + [_gather(rows.column(v), right) for v in new])
+
+    def _filter(self, bindings: Bindings, condition: dsl.Condition, tables: Dict[str, Table]) -> Bindings:
+        """
+        the bindings where ```condition``` holds
+        """
+        if isinstance(condition, dsl.EqualTo):
+            column = tables[condition.variable].columns.get(condition.property)
+            value_id = self.example.pool.id_of(condition.constant)
+
+            # a missing property is null in Cypher, which never equals to a constant
+            if column is None or value_id is None:
+                return bindings.take([])
+
+            rows = bindings.column(condition.variable)
+            return bindings.take([k for k, row in enumerate(rows) if column[row] == value_id])
+        else:
+            raise RuntimeError(f"Illegall Condition: {condition}")
+
+    def _project(self, bindings: Bindings, statement: dsl.Return, tables: Dict[str, Table]) -> List[tuple]:
+        if not bindings:
+            return []
+
+        # Return checks IS NOT NULL on every returned property,
+        # a property is either in every row of a table or missing
+        columns = [tables[var].columns.get(prop) for var, prop in zip(statement.variables, statement.properties)]
+        if None in columns:
+            return []
+
+        values = self.example.pool.values
+        selected = [(bindings.column(var), column) for var, column in zip(statement.variables, columns)]
+        result = []
+        for start in range(0, len(bindings), CHUNK_ROWS):
+            result.extend(zip(*(map(values.__getitem__, map(column.__getitem__, rows[start:start + CHUNK_ROWS]))
+                                for rows, column in selected)))
+        return result
+
+
+def _gather(column: array, indexes: Sequence[int]) -> array:
+    """
+    ```column[i]``` for each i in ```indexes```, CHUNK_ROWS at a time
+    """
+    gathered = array("i")
+    for start in range(0, len(indexes), CHUNK_ROWS):
+        gathered.extend(map(column.__getitem__, indexes[start:start + CHUNK_ROWS]))
+    return gathered
@@ -0,0 +1,58 @@
+from typing import List, Dict
+import threading
+
+class ExampleOrder:
+    """
+    The order to validate candidates on several examples
+
+    A candidate is valid only if it passes every example,
+    so it is validated on one example at a time and stops at the first rejection.
+    The example that rejects the most candidates per second of validation goes first:
+    its rejection rate and per candidate cost are learned during the search,
+    so the order adapts to the candidates of later sketches.
+    An example never validated yet goes first, so every example gets measured.
+    """
+    checked: List[int]  # candidates validated on each example
+    rejected: List[int]  # candidates rejected by each example
+    seconds: List[float]  # time spent on each example
+
+    def __init__(self, num_examples: int) -> None:
+        self.checked = [0] * num_examples
+        self.rejected = [0] * num_examples
+        self.seconds = [0.0] * num_examples
+        self._lock = threading.Lock()  # recorded on worker threads in parallel search
+
+    def order(self) -> List[int]:
+        """
+        indexes of the examples, in the order to validate
+        """
+        if len(self.checked) == 1:
+            return [0]
+
+        with self._lock:
+            return sorted(range(len(self.checked)), key=self._score, reverse=True)
+
+    def record(self, index: int, num_checked: int, num_rejected: int, seconds: float) -> None:
+        with self._lock:
+            self.checked[index] += num_checked
+            self.rejected[index] += num_rejected
+            self.seconds[index] += seconds
+
+    def stats(self) -> List[Dict]:
+        """
+        checked, rejected and seconds of each example
+        """
+        with self._lock:
+            return [{"checked": checked, "rejected": rejected, "seconds": seconds}
+                    for checked, rejected, seconds in zip(self.checked, self.rejected, self.seconds)]
+
+    def _score(self, index: int) -> float:
+        """
+        expected rejections per second of validation
+        """
+        checked = self.checked[index]
+        if checked == 0 or self.seconds[index] == 0:
+            return float("inf")
+
+        rejection_rate = (self.rejected[index] + 1) / (checked + 2)  # smoothed towards 1/2
+        return rejection_rate / (self.seconds[index] / checked)
@@ -1,7 +1,14 @@
 from pathlib import Path
-from typing import List, Dict
+import hashlib
+import json
+import time
+import csv
+from itertools import chain
+from array import array
+from typing import List, Dict, Tuple, Iterator, TextIO
 
-from record import Node, Relation, Output
+from record import Output
+from table import StringPool, Table, RelationTable
 
 TYPE_OUTPUT = "output"
 TYPE_NODE = "node"
@@ -11,79 +18,210 @@ TYPE_CONSTANT = "constant"
 class Example:
     """
     A I/O example of a graph query
+
+    Nodes and relations are stored by column (see table.py),
+    ```nodes[label]``` and ```relations[label]``` are tables which could also be read as record.Node/Relation.
     """
-    nodes: Dict[str, List[Node]]
-    relations: Dict[str, List[Relation]]
+    path: str
+    pool: StringPool
+    nodes: Dict[str, Table]
+    relations: Dict[str, RelationTable]
+    relation_endpoints: Dict[str, Tuple[str, str]]  # relation label -> (src_node label, dst_node label)
     output: List[Output]
     constants: List[str]
+    constant_index: Dict[str, Dict[Tuple[str, str], int]]  # constant -> {(label, property): number of rows}
+    num_rows: int  # parse statistics: csv rows and bytes read, and seconds it took
+    num_bytes: int
+    parse_seconds: float
 
     def __init__(self, example_dir_path: str) -> None:
+        self.path = str(Path(example_dir_path).resolve())
+        self.pool = StringPool()
         self.nodes = {}
         self.relations = {}
+        self.relation_endpoints = {}
         self.output = []
         self.constants = []
+        self.constant_index = {}
+        self.num_rows = 0
+        self.num_bytes = 0
+        self.parse_seconds = 0.0
 
         self._parse_example(example_dir_path)
+        self._index_constants()
+
+    def columns(self) -> Iterator[Tuple[Tuple[str, str], array]]:
+        """
+        all property columns of nodes and relations
+        ((label, property), [interned value id of each row]), see ```pool```
+        """
+        for table in chain(self.nodes.values(), self.relations.values()):
+            for property, column in table.columns.items():
+                yield (table.label, property), column
+
+    def parse_throughput(self) -> str:
+        """
+        human readable parse statistics
+        """
+        seconds = max(self.parse_seconds, 1e-9)
+        return (f"{self.num_rows} rows ({self.num_bytes / 1e6:.1f}MB) in {self.parse_seconds:.2f}s, "
+                f"{self.num_rows / seconds:.0f} rows/s, {self.num_bytes / 1e6 / seconds:.1f}MB/s")
+
+    def row_count(self, label: str) -> int:
+        """
+        number of nodes or relations with ```label```
+        """
+        return len(self.nodes.get(label) or self.relations.get(label) or [])
+
+    def constant_count(self, constant: str, label: str, property: str) -> int:
+        """
+        number of rows of ```label``` whose ```property``` equals to ```constant```
+        (a constant not in constant.csv, e.g. one of another example, is indexed on first use)
+        """
+        columns = self.constant_index.get(constant)
+        if columns is None:
+            columns = self._index_constant(constant)
+        return columns.get((label, property), 0)
+
+    def fingerprint(self) -> str:
+        """
+        A stable hash of the whole example (nodes, relations, output and constants),
+        it does not depend on the order of files or rows
+        """
+        return _digest([self.graph_fingerprint(), self.output_fingerprint(), sorted(self.constants)])
+
+    def graph_fingerprint(self) -> str:
+        """
+        A stable hash of the nodes and relations,
+        it does not depend on the order of files or rows
+        """
+        def row_properties(table: Table, row: int) -> List[Tuple[str, str]]:
+            return sorted((property, table.value(row, property)) for property in table.properties)
+
+        nodes = sorted((table.label, table.ids[row], row_properties(table, row))
+                       for table in self.nodes.values() for row in range(len(table)))
+        relations = sorted((table.label, table.ids[row],
+                            table.src_table.label, table.src_table.ids[table.src_rows[row]],
+                            table.dst_table.label, table.dst_table.ids[table.dst_rows[row]],
+                            row_properties(table, row))
+                           for table in self.relations.values() for row in range(len(table)))
+        return _digest([nodes, relations])
+
+    def output_fingerprint(self) -> str:
+        """
+        A stable hash of the output (as a multiset of rows)
+        """
+        keys = self.output[0].keys if self.output else []
+        return _digest([keys, sorted(output.values for output in self.output)])
+
+    def _index_constants(self) -> None:
+        """
+        Inverted index from each constant to the columns it appears in
+        """
+        for constant in set(self.constants):
+            self._index_constant(constant)
+
+    def _index_constant(self, constant: str) -> Dict[Tuple[str, str], int]:
+        """
+        add ```constant``` to the constant index, and return its columns
+        """
+        columns = {}
+        value_id = self.pool.id_of(constant)
+        if value_id is not None:  # otherwise in no column
+            for column, values in self.columns():
+                count = values.count(value_id)
+                if count:
+                    columns[column] = count
+
+        self.constant_index[constant] = columns
+        return columns
 
     def _parse_example(self, path) -> None:
         """
         Parse I/O example in diretory ```path```
 
-        format of each file:
+        format of each file (csv, values could be quoted):
         <type>[,<label>]
         <property_name 1>,<property_name 2>...
         <value 1>,<value 2>...
         ...
+
+        Files are read row by row, so only the parsed columns are kept in memory.
         """
+        start = time.perf_counter()
         path = Path(path)
         relation_files = []
+        node_rows = {}  # label -> {node id: row}, to resolve endpoints of relations
+
+        # sorted, so the order of labels and constants does not depend on the file system
+        for f in sorted(x for x in path.iterdir() if x.is_file()):  # loop over all files
+            with f.open(newline="") as ex:
+                rows = self._read_rows(f, ex)
+                header = next(rows, None)
+                if header is None:
+                    raise RuntimeError(f"Empty file: {f.absolute()}")
 
-        for f in [x for x in path.iterdir() if x.is_file()]:  # loop over all files
-            with f.open() as ex:
-                lines = [line.strip() for line in ex.readlines()]
-                
-                ex_type = lines[0].split(",")[0]
+                ex_type = header[0]
 
                 if ex_type == TYPE_OUTPUT:
-                    self._parse_output(lines[1:])
+                    self._parse_output(rows)
                 elif ex_type == TYPE_NODE:
-                    self._parse_nodes(lines[0].split(",")[1], lines[1:])
+                    node_rows[header[1]] = self._parse_nodes(header[1], rows)
                 elif ex_type == TYPE_RELATION:
-                    # relation should be parsed at the end since it need to find previous node objects
+                    # relation should be parsed at the end since it need to find previous nodes
                     relation_files.append(f)
                 elif ex_type == TYPE_CONSTANT:
-                    self.constants.extend(lines[1:])
+                    self.constants.extend(",".join(row) for row in rows)
                 else:
-                    raise RuntimeError(f"Illegall file: {f.absolute}")
+                    raise RuntimeError(f"Illegall file: {f.absolute()}")
 
         # parse relation
         for f in relation_files:
-            with f.open() as ex:
-                lines = [line.strip() for line in ex.readlines()]
-                self._parse_relations(lines[0].split(",")[1], lines[1:])
+            with f.open(newline="") as ex:
+                rows = self._read_rows(f, ex)
+                self._parse_relations(next(rows)[1], rows, node_rows)
+
+        self.parse_seconds = time.perf_counter() - start
+
+    def _read_rows(self, f: Path, ex: TextIO) -> Iterator[List[str]]:
+        """
+        non empty csv rows of an opened file, counted in the parse statistics
+        """
+        self.num_bytes += f.stat().st_size
+        for row in csv.reader(ex):
+            if row:
+                self.num_rows += 1
+                yield row
 
-    def _parse_nodes(self, label: str, lines: List[str]) -> None:
+    def _parse_nodes(self, label: str, rows: Iterator[List[str]]) -> Dict[int, int]:
         """
         format:
         <property_name 1>,<property_name 2>...
         <value 1>,<value 2>...
         ...
+
+        Return the row of each node id
         """
-        property_name = lines[0].split(",")
+        property_name = next(rows)
         property_num = len(property_name)
 
-        nodes = []
-        for l in lines[1:]:
-            values = l.split(",")
-            
-            node = Node(label, int(values[0]))
-            for i in range(1, property_num):  
-                node.properties[property_name[i]] = values[i]
-            nodes.append(node)
+        table = Table(label, self.pool, property_name[1:])
+        row_of_id = {}
+        for values in rows:
+            if len(values) < property_num:
+                raise IndexError(f"Missing values of {label}: {values}")
+
+            node_id = int(values[0])
+            if node_id in row_of_id:
+                raise RuntimeError(f"Duplicated id of {label}: {node_id}")
+
+            row_of_id[node_id] = len(table)
+            table.append(node_id, values[1:property_num])
 
-        self.nodes[label] = nodes
+        self.nodes[label] = table
+        return row_of_id
 
-    def _parse_relations(self, label: str, lines: List[str]) -> None:
+    def _parse_relations(self, label: str, rows: Iterator[List[str]], node_rows: Dict[str, Dict[int, int]]) -> None:
         """
         format:
         id,<src_node Label>,<dst_node Label>[,<property name 1> ...]
@@ -92,7 +230,7 @@ class Example:
 
         Note: the relation has direction from src to dst
         """
-        first_line_split = lines[0].split(",")
+        first_line_split = next(rows)
 
         src_node_label = first_line_split[1]
         dst_node_label = first_line_split[2]
@@ -100,37 +238,54 @@ class Example:
 
         property_num = len(property_name)
 
-        rels = []
-        for l in lines[1:]:
-            line_split = l.split(",")
-
+        src_rows = node_rows[src_node_label]
+        dst_rows = node_rows[dst_node_label]
+        table = RelationTable(label, self.pool, property_name, self.nodes[src_node_label], self.nodes[dst_node_label])
+        for line_split in rows:
             rel_id = int(line_split[0])
             src_node_id = int(line_split[1])
             dst_node_id = int(line_split[2])
             values = line_split[3:]
+            if len(values) < property_num:
+                raise IndexError(f"Missing values of {label}: {line_split}")
 
-            # find node object by id and label
-            src_node = self.nodes[src_node_label][src_node_id]
-            dst_node = self.nodes[dst_node_label][dst_node_id]
+            # find the nodes by id and label
+            if src_node_id not in src_rows or dst_node_id not in dst_rows:
+                raise RuntimeError(f"No such node of {label}: {line_split}")
 
-            rel = Relation(label, src_node, dst_node, rel_id)
-            for i in range(property_num):  
-                rel.properties[property_name[i]] = values[i]
-            rels.append(rel)
+            table.append_relation(rel_id, src_rows[src_node_id], dst_rows[dst_node_id], values[:property_num])
 
-        self.relations[label] = rels
+        self.relations[label] = table
+        self.relation_endpoints[label] = (src_node_label, dst_node_label)
 
-    def _parse_output(self, lines: List[str]) -> None:
+    def _parse_output(self, rows: Iterator[List[str]]) -> None:
         """
         format:
         <property_name 1>,<property_name 2>...
         <value 1>,<value 2>...
         ...
         """
-        keys = lines[0].split(",")
+        keys = next(rows)
 
-        for l in lines[1:]:
+        for values in rows:
             output = Output()
             output.keys = keys
-            output.values = l.split(",")
-            self.output.append(output)
\ No newline at end of file
+            output.values = values
+            self.output.append(output)
+
+
+def examples_fingerprint(examples: List[Example]) -> str:
+    """
+    A stable hash of several examples, it does not depend on their order
+    (the fingerprint of the example itself if there is only one)
+    """
+    if len(examples) == 1:
+        return examples[0].fingerprint()
+    return _digest(sorted(example.fingerprint() for example in examples))
+
+
+def _digest(data) -> str:
+    """
+    sha256 of json serializable ```data```
+    """
+    return hashlib.sha256(json.dumps(data).encode("utf-8")).hexdigest()
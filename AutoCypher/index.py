@@ -0,0 +1,41 @@
+from typing import List, Set, Tuple, Union
+
+from example_parser import Example
+
+class ProvenanceIndex:
+    """
+    Where the output could come from.
+
+    Maps each output column to the (label, property) columns of the example
+    that contain all values of that output column.
+    A Return could only take an output column from one of them.
+
+    With several examples, a column should contain the output of every example
+    (an example with an empty output allows any column).
+    """
+    columns: List[Set[Tuple[str, str]]]
+
+    def __init__(self, example: Union[Example, List[Example]]) -> None:
+        if isinstance(example, list):
+            indexes = [ProvenanceIndex(e) for e in example if e.output]
+            self.columns = [set.intersection(*columns) for columns in zip(*(index.columns for index in indexes))]
+            return
+
+        self.columns = []
+
+        # columns are compared on interned value ids (see table.StringPool)
+        column_values = {column: set(values) for column, values in example.columns()}
+        num_columns = len(example.output[0].keys) if example.output else 0
+
+        for i in range(num_columns):
+            needed = {example.pool.id_of(output.values[i]) for output in example.output}
+            if None in needed:
+                self.columns.append(set())  # some value is in no column
+                continue
+            self.columns.append({column for column, values in column_values.items() if needed <= values})
+
+    def allows(self, index: int, label: str, property: str) -> bool:
+        """
+        whether output column ```index``` could be returned from ```label```.```property```
+        """
+        return (label, property) in self.columns[index]
@@ -0,0 +1,173 @@
+from typing import List, Dict, ContextManager, TextIO
+from contextlib import nullcontext
+from bisect import bisect_left
+import threading
+import json
+import time
+import sys
+
+# phases of validating a candidate, timed by Metrics.timer
+PHASE_COMPLETION = "completion"  # generate (and prune) a batch of candidates
+PHASE_TRANSLATION = "translation"  # translate candidates to Cypher
+PHASE_QUERY = "query"  # run candidates on the evaluator
+PHASE_COMPARISON = "comparison"  # compare results with the target
+PHASE_ROUND_TRIP = "database.round_trip"  # a read transaction on neo4j (recorded by CypherDatabase)
+
+# counters
+CANDIDATES_GENERATED = "candidates.generated"  # completed programs
+CANDIDATES_PRUNED = "candidates.pruned"  # equivalent to an evaluated program
+PREFIXES_PRUNED = "prefixes.pruned"  # prefixes equivalent to an evaluated one, none of their Return is generated
+CANDIDATES_CACHED = "candidates.cached"  # verdict taken from the verdict cache
+CANDIDATES_QUERIED = "candidates.queried"  # validated by the evaluator
+DATABASE_QUERIES = "database.queries"  # Cypher queries sent to neo4j
+
+# upper bounds (seconds) of the buckets of latency histograms, the last bucket is unbounded
+LATENCY_BUCKETS = [1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0]
+
+class MetricsSink:
+    """
+    Where Metrics.emit sends its records (a dict of JSON serializable values)
+    """
+    def emit(self, record: Dict) -> None:
+        raise NotImplementedError("Please Implement this method")
+
+
+class JsonLinesSink(MetricsSink):
+    """
+    Write each record as a JSON line to ```stream``` (stderr by default)
+    """
+    def __init__(self, stream: TextIO = None) -> None:
+        self.stream = stream if stream is not None else sys.stderr
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict) -> None:
+        line = json.dumps(record)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class MemorySink(MetricsSink):
+    """
+    Keep the records in ```records```, to read them in process
+    """
+    records: List[Dict]
+
+    def __init__(self) -> None:
+        self.records = []
+
+    def emit(self, record: Dict) -> None:
+        self.records.append(record)
+
+
+class Metrics:
+    """
+    Counters and timers of a synthesis job
+
+    Every timer keeps its total seconds, number of calls and a latency histogram (see LATENCY_BUCKETS).
+    The current values are read with snapshot(), and records (e.g. one per sketch) are sent to ```sinks``` by emit().
+
+    A disabled Metrics (NULL_METRICS, the default of every component) records nothing:
+    count() and observe() return at once, and timer() returns a shared empty context manager.
+    Hot loops could also check ```enabled``` before computing what they record.
+    """
+    enabled: bool
+    sinks: List[MetricsSink]
+    counters: Dict[str, int]
+    timers: Dict[str, List]  # name -> [number of calls, total seconds, count of each bucket]
+
+    def __init__(self, sinks: List[MetricsSink] = None, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.sinks = sinks or []
+        self.counters = {}
+        self.timers = {}
+        self._lock = threading.Lock()  # recorded on worker threads in parallel search
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timer(self, name: str) -> ContextManager:
+        """
+        with metrics.timer(PHASE_QUERY):
+            ...
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        record a call of ```seconds``` to timer ```name```
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = [0, 0.0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> Dict:
+        """
+        {
+            "counters": {name: value},
+            "timers": {name: {"count": calls, "seconds": total, "histogram": {bucket upper bound: calls}}}
+        }
+        """
+        with self._lock:
+            timers = {}
+            for name, (count, seconds, buckets) in self.timers.items():
+                bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["inf"]
+                timers[name] = {"count": count, "seconds": seconds,
+                                "histogram": {bound: n for bound, n in zip(bounds, buckets) if n}}
+            return {"counters": dict(self.counters), "timers": timers}
+
+    def emit(self, event: str, **fields) -> None:
+        """
+        send a record of ```event``` with ```fields``` to every sink
+        """
+        if not self.enabled:
+            return
+
+        record = {"event": event, "time": time.time(), **fields}
+        for sink in self.sinks:
+            sink.emit(record)
+
+
+def snapshot_delta(before: Dict, after: Dict) -> Dict:
+    """
+    counters and timer totals recorded between two snapshots (histograms are left out)
+    """
+    counters = {name: value - before["counters"].get(name, 0) for name, value in after["counters"].items()}
+    timers = {}
+    for name, timer in after["timers"].items():
+        old = before["timers"].get(name, {"count": 0, "seconds": 0.0})
+        timers[name] = {"count": timer["count"] - old["count"], "seconds": timer["seconds"] - old["seconds"]}
+
+    return {"counters": {name: value for name, value in counters.items() if value},
+            "timers": {name: timer for name, timer in timers.items() if timer["count"]}}
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: Metrics, name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+_NULL_TIMER = nullcontext()
+NULL_METRICS = Metrics(enabled=False)
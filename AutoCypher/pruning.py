@@ -0,0 +1,157 @@
+from typing import List, Dict, Set, Tuple
+
+from evaluator import InMemoryEvaluator
+import dsl
+
+def canonical_program(program: List[dsl.DSL]) -> List[dsl.DSL]:
+    """
+    Normal form of a completed DSL program
+
+    1. a single node Match is dropped if its variable is matched by another Match
+    2. variables are renamed in the order they appear in Match statements
+       sorted by labels (node to n<number>, relation to r<number>)
+    3. Match and Require statements are sorted and deduplicated
+
+    Programs with the same normal form return the same result on any graph.
+    """
+    matches = [s for s in program if isinstance(s, dsl.Match)]
+    requires = [s for s in program if isinstance(s, dsl.Require)]
+    returns = [s for s in program if isinstance(s, dsl.Return)]
+
+    # MATCH (a) MATCH (a)-[r]->(b) is the same as MATCH (a)-[r]->(b)
+    related_variables = set()
+    for match in matches:
+        if match.relation is not None:
+            related_variables.update((match.node.variable, match.node2.variable))
+    matches = [m for m in matches if m.relation is not None or m.node.variable not in related_variables]
+
+    # rename variables, the order only depends on labels
+    # so the choice of variable names does not change the normal form
+    renaming = {}
+    for match in sorted(matches, key=_label_key):
+        for item in (match.node, match.relation, match.node2):
+            if item is not None and item.variable not in renaming:
+                prefix = "r" if isinstance(item, dsl.Relation) else "n"
+                renaming[item.variable] = f"{prefix}{sum(v[0] == prefix for v in renaming.values())}"
+
+    normal_matches = {_rename_match(m, renaming) for m in matches}
+    normal_requires = {_rename_require(r, renaming) for r in requires}
+    normal_returns = [dsl.Return(r.properties, [renaming[v] for v in r.variables]) for r in returns]
+
+    return (sorted(normal_matches, key=lambda s: s.key()) + sorted(normal_requires, key=lambda s: s.key())
+            + normal_returns)
+
+def canonical_form(program: List[dsl.DSL]) -> tuple:
+    """
+    hashable key of the normal form
+    """
+    return tuple(statement.key() for statement in canonical_program(program))
+
+def _label_key(match: dsl.Match) -> tuple:
+    if match.relation is not None:
+        return (1, match.node.label, match.relation.label, match.relation.directed, match.node2.label,
+                match.node.variable == match.node2.variable)
+    else:
+        return (0, match.node.label)
+
+def _rename_match(match: dsl.Match, renaming: Dict[str, str]) -> dsl.Match:
+    node = dsl.Node(match.node.label, renaming[match.node.variable])
+    if match.relation is None:
+        return dsl.Match(node)
+
+    relation = dsl.Relation(match.relation.label, renaming[match.relation.variable], match.relation.directed)
+    node2 = dsl.Node(match.node2.label, renaming[match.node2.variable])
+    return dsl.Match(node, relation, node2)
+
+def _rename_require(require: dsl.Require, renaming: Dict[str, str]) -> dsl.Require:
+    condition = require.condition
+    if isinstance(condition, dsl.EqualTo):
+        return dsl.Require(dsl.EqualTo(condition.property, renaming[condition.variable], condition.constant))
+    else:
+        raise RuntimeError(f"Illegall Condition: {condition}")
+
+
+class CandidatePruner:
+    """
+    Skip candidate programs that are known to be rejected
+
+    1. symmetry: a program with the same normal form is already evaluated
+    2. observational equivalence: the Match/Require part of the program binds
+       exactly the same rows on every example as an earlier one,
+       so every Return over it gives an already rejected result
+
+    With several examples, the bindings on the first example are compared first,
+    the others are only evaluated (for both prefixes) when all earlier examples bind the same rows.
+    Bindings are remembered by their digest (see InMemoryEvaluator.bindings_signature),
+    so a prefix costs the same memory however many rows it binds.
+    """
+    evaluators: List[InMemoryEvaluator]
+    seen_programs: Set[tuple]
+    seen_prefixes: Dict[Tuple[frozenset, bytes], List["_PrefixSignatures"]]
+
+    def __init__(self, evaluators: List[InMemoryEvaluator]) -> None:
+        """
+        ```evaluators```: an evaluator of each example
+        """
+        self.evaluators = evaluators
+        self.seen_programs = set()
+        self.seen_prefixes = {}
+
+    def is_duplicate(self, program: List[dsl.DSL]) -> bool:
+        """
+        check and remember the equivalence class of a completed program
+        """
+        form = canonical_form(program)
+        if form in self.seen_programs:
+            return True
+
+        self.seen_programs.add(form)
+        return False
+
+    def is_equivalent_prefix(self, prefix: List[dsl.DSL], variables: Set[str]) -> bool:
+        """
+        check and remember the bindings of a Match/Require prefix on the examples
+        """
+        signatures = _PrefixSignatures(list(prefix))
+        key = (frozenset(variables), signatures.get(0, self.evaluators))
+        if len(self.evaluators) == 1:
+            signatures.prefix = None  # only needed to evaluate it on the other examples later
+        seen = self.seen_prefixes.get(key)
+        if seen is None:
+            self.seen_prefixes[key] = [signatures]
+            return False
+
+        for other in seen:
+            if all(other.get(i, self.evaluators) == signatures.get(i, self.evaluators)
+                   for i in range(1, len(self.evaluators))):
+                return True
+
+        seen.append(signatures)
+        return False
+
+    def state(self) -> Tuple[Set[tuple], Dict[Tuple[frozenset, bytes], List["_PrefixSignatures"]]]:
+        """
+        the remembered programs and prefixes (not copied, pickle them to checkpoint a search)
+        """
+        return self.seen_programs, self.seen_prefixes
+
+    def restore(self, state: Tuple[Set[tuple], Dict[Tuple[frozenset, bytes], List["_PrefixSignatures"]]]) -> None:
+        seen_programs, seen_prefixes = state
+        self.seen_programs = set(seen_programs)
+        self.seen_prefixes = dict(seen_prefixes)
+
+
+class _PrefixSignatures:
+    """
+    bindings signatures of a prefix on each example, evaluated on demand
+    """
+    __slots__ = ("prefix", "signatures")
+
+    def __init__(self, prefix: List[dsl.DSL]) -> None:
+        self.prefix = prefix
+        self.signatures = []
+
+    def get(self, index: int, evaluators: List[InMemoryEvaluator]) -> bytes:
+        while len(self.signatures) <= index:
+            self.signatures.append(evaluators[len(self.signatures)].bindings_signature(self.prefix))
+        return self.signatures[index]
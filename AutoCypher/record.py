@@ -1,8 +1,18 @@
+def quote(value: str) -> str:
+    """
+    A Cypher string literal of ```value``` (with quotes and backslashes escaped)
+    """
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
 
 class Node:
     """
     A node in graph
     """
+    __slots__ = ("label", "id", "properties")
+
     def __init__(self, label: str, node_id: int) -> None:
         self.label = label
         self.id = node_id
@@ -18,7 +28,15 @@ class Node:
         """
         (variable:label {property: 'value'})
         """
-        properties_str_list = [k + ": " + '"' + v + '"' for k, v in self.properties.items()]
+        properties_str_list = [k + ": " + quote(v) for k, v in self.properties.items()]
+        return f"({variable}:{self.label} {{{', '.join(properties_str_list)}}})"
+
+    def str_with_parameter(self, variable: str, parameter: str) -> str:
+        """
+        (variable:label {property: $parameter.property})
+        the values are passed as the map parameter ```parameter``` (see ```properties```)
+        """
+        properties_str_list = [f"{k}: ${parameter}.{k}" for k in self.properties]
         return f"({variable}:{self.label} {{{', '.join(properties_str_list)}}})"
 
     def __str__(self) -> str:
@@ -38,6 +56,8 @@ class Relation:
     """
     A relation between two nodes
     """
+    __slots__ = ("label", "id", "src_node", "dst_node", "properties")
+
     def __init__(self, label: str, src_node: Node, dst_node: Node, rel_id: int) -> None:
         self.label = label
         self.id = rel_id
@@ -55,10 +75,18 @@ class Relation:
         """
         -[variable:label {property: 'value'}]->
         """
-        properties_str_list = [k + ": " + '"' + v + '"' for k, v in self.properties.items()]
+        properties_str_list = [k + ": " + quote(v) for k, v in self.properties.items()]
         rel_str = f"-[{variable}:{self.label} {{{', '.join(properties_str_list)}}}]->"  # the direction is fixed
         return rel_str
 
+    def short_repr_with_parameter(self, variable: str, parameter: str) -> str:
+        """
+        -[variable:label {property: $parameter.property}]->
+        the values are passed as the map parameter ```parameter``` (see ```properties```)
+        """
+        properties_str_list = [f"{k}: ${parameter}.{k}" for k in self.properties]
+        return f"-[{variable}:{self.label} {{{', '.join(properties_str_list)}}}]->"  # the direction is fixed
+
     def __str__(self) -> str:
         """
         (:node_label {property: 'value'})-[:label {property: 'value'}]->(:node_label2 {property: 'value'})
@@ -79,6 +107,8 @@ class Output:
     """
     An output of a query (a single row)
     """
+    __slots__ = ("keys", "values")
+
     def __init__(self) -> None:
         self.keys = []
         self.values = []
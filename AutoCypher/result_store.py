@@ -0,0 +1,49 @@
+from typing import Dict, Optional
+from pathlib import Path
+import json
+import os
+import time
+
+class ResultStore:
+    """
+    Finished synthesis results in a JSON file, keyed by the fingerprint of the example
+    and the options changing the result of the search (direction of relations, max sketch size)
+
+    {
+        <fingerprint>:<directed|undirected>:<max sketch size>: {"query": <Cypher query>, "seconds": <time of the search>, "created": <unix time>},
+        ...
+    }
+    """
+    path: Path
+    results: Dict[str, Dict]
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.results = {}
+
+        if self.path.exists():
+            with self.path.open() as f:
+                self.results = json.load(f)
+
+    def get(self, fingerprint: str, undirected_relations: bool, max_sketch_size: int) -> Optional[Dict]:
+        """
+        Return the stored result of an example searched with the same options, or None
+        """
+        return self.results.get(_key(fingerprint, undirected_relations, max_sketch_size))
+
+    def put(self, fingerprint: str, undirected_relations: bool, max_sketch_size: int,
+            query: str, seconds: float) -> None:
+        """
+        Store the result of an example, the file is replaced at once so it is never half written
+        """
+        self.results[_key(fingerprint, undirected_relations, max_sketch_size)] = {"query": query, "seconds": seconds, "created": time.time()}
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(self.results, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _key(fingerprint: str, undirected_relations: bool, max_sketch_size: int) -> str:
+    direction = "undirected" if undirected_relations else "directed"
+    return f"{fingerprint}:{direction}:{max_sketch_size}"
@@ -0,0 +1,45 @@
+from typing import List, Set, Tuple, Callable
+import heapq
+
+import dsl
+
+class SketchScheduler:
+    """
+    Best-first order of sketches
+
+    Sketches are popped by their estimated cost (see Synthesizer._estimate_sketch),
+    so small and cheap sketches are exhausted before large ones.
+    A sketch reached by different expansion paths is only scheduled once,
+    and sketches with more than ```max_size``` statements are never scheduled.
+    """
+    estimate: Callable[[List[dsl.DSL.__subclasses__]], float]
+    max_size: int
+    heap: List[Tuple[float, int, int, List[dsl.DSL.__subclasses__]]]
+    visited: Set[tuple]
+
+    def __init__(self, estimate: Callable[[List[dsl.DSL.__subclasses__]], float], max_size: int) -> None:
+        self.estimate = estimate
+        self.max_size = max_size
+        self.heap = []  # (cost, size, order pushed, sketch)
+        self.visited = set()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, sketch: List[dsl.DSL.__subclasses__]) -> bool:
+        """
+        Schedule a sketch, return False if it is already scheduled or too large
+        """
+        key = tuple(dsl_class.__name__ for dsl_class in sketch)
+        if len(sketch) > self.max_size or key in self.visited:
+            return False
+
+        self.visited.add(key)
+        heapq.heappush(self.heap, (self.estimate(sketch), len(sketch), len(self.visited), sketch))
+        return True
+
+    def pop(self) -> List[dsl.DSL.__subclasses__]:
+        """
+        the cheapest scheduled sketch
+        """
+        return heapq.heappop(self.heap)[-1]
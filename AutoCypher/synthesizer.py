@@ -1,246 +1,861 @@
 from turtle import st
-from typing import List, Dict
-from queue import Queue
-from itertools import product, chain
+from typing import List, Dict, Set, Tuple, Iterator, Optional, Union
+from itertools import product, islice
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, ExitStack
+from pathlib import Path
+import threading
+import warnings
+import pickle
+import time
+import argparse
 
-from example_parser import Example
+from example_parser import Example, examples_fingerprint
 from database import CypherDatabase
+from evaluator import Evaluator, InMemoryEvaluator, CypherEvaluator
+from pruning import CandidatePruner, canonical_program
+from verdict_cache import VerdictCache
+from result_store import ResultStore
+from scheduler import SketchScheduler
+from estimator import SearchSpaceEstimator, RULES
+from budget import Budget, SynthesisNotFound, REASON_SIZE_LIMIT
+from checkpoint import Checkpoint
+from metrics import Metrics, NULL_METRICS, JsonLinesSink, snapshot_delta, PHASE_COMPLETION, PHASE_TRANSLATION, \
+    CANDIDATES_GENERATED, CANDIDATES_PRUNED, PREFIXES_PRUNED, CANDIDATES_CACHED, CANDIDATES_QUERIED
+from index import ProvenanceIndex
+from example_order import ExampleOrder
 import dsl
 
+# default number of statements of the largest sketch searched
+MAX_SKETCH_SIZE = 5
+
+# where the command line keeps finished results (ignored by git)
+RESULT_STORE_PATH = str(Path(__file__).resolve().parent.parent / "synthesis_results.json")
+
 class Synthesizer:
     """
-    Synthesis Cypher query from given Input/Output example
+    Synthesis Cypher query from given Input/Output example(s)
+
+    With several examples of the same query, a candidate is valid if it passes all of them.
     """
     # type annotation
-    example: Example
+    examples: List[Example]
+    example: Example  # the first example
     database: CypherDatabase
+    evaluators: List[Evaluator]  # evaluator of each example
+    evaluator: Evaluator  # the first evaluator
+    example_order: ExampleOrder
+    sorted_targets: List[List[tuple]]  # sorted output of each example
+    workers: int
+    verdict_cache: VerdictCache
+    result_store: ResultStore
+    metrics: Metrics
+    pruner: CandidatePruner
+    provenance: ProvenanceIndex
+    estimator: SearchSpaceEstimator
     node_labels: List[str]
     node_properties: Dict[str, List[str]]
     dsl_nodes: List[dsl.Node]
     relation_labels: List[str]
     relation_properties: Dict[str, List[str]]
     dsl_relations: List[dsl.Relation]
+    undirected_relations: bool
+    schema_edges: List[Tuple[str, str, str]]
+    dsl_matches: List[dsl.Match]
     fixed_Return_statement: dsl.Return
     variable_to_label: Dict[str, str]
     labels_to_properties: Dict[str, List[str]]
+    constants: List[str]
+    num_sketches: int
+    num_candidates: int
+    num_queries: int
 
-    def __init__(self, example: Example, database: CypherDatabase) -> None:
-        self.example = example
+    def __init__(self, example: Union[Example, List[Example]], database: CypherDatabase = None,
+                 evaluator: Evaluator = None, undirected_relations: bool = False, workers: int = 1, verdict_cache: VerdictCache = None,
+                 result_store: ResultStore = None, metrics: Metrics = None) -> None:
+        """
+        ```example``` is an example or a list of examples of the query.
+        Candidates are validated by ```evaluator``` (in memory by default), on the first example;
+        other examples are validated in memory.
+        If ```database``` is given, the found query is confirmed on it (holding the first example) before returning.
+        If ```undirected_relations```, relations are matched in either direction.
+        If ```workers``` > 1, batches of candidates are validated on a pool of threads
+        (each thread holds its own database session).
+        Only I/O-bound evaluators (CypherEvaluator) gain from threads, the in-memory evaluator holds the GIL
+        and is slower on several threads, so it always runs on one worker (with a warning).
+        If ```verdict_cache``` is given, known verdicts are taken from it instead of validating again
+        (it is keyed by the examples of this synthesizer, see VerdictCache.use).
+        If ```result_store``` is given, an example synthesized before with the same options gets its stored query at once.
+        If ```metrics``` is given, the timings and counters of the search are recorded to it
+        (pass the same one to the evaluator or database to record their phases too).
+        """
+        self.examples = example if isinstance(example, list) else [example]
+        self.example = self.examples[0]
         self.database = database
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.evaluators = [InMemoryEvaluator(e, metrics=self.metrics) for e in self.examples]
+        if evaluator is not None:
+            self.evaluators[0] = evaluator
+        self.evaluator = self.evaluators[0]
+        if workers > 1 and not self.evaluator.io_bound:
+            warnings.warn(f"{type(self.evaluator).__name__} is not I/O-bound, "
+                          f"validating on 1 worker instead of {workers}", stacklevel=2)
+            workers = 1
+        self.example_order = ExampleOrder(len(self.examples))
+        self.sorted_targets = []
+        self.workers = workers
+        self.verdict_cache = verdict_cache
+        if verdict_cache is not None:
+            verdict_cache.use(self.examples)
+        self.result_store = result_store
+        self.pruner = None
+        self.provenance = ProvenanceIndex(self.examples)
         self.node_labels = []  # labels str
         self.node_properties = {}  # properties str
         self.dsl_nodes = []  # dsl object
         self.relation_labels = []
         self.relation_properties = {}
         self.dsl_relations = []
+        self.undirected_relations = undirected_relations
+        self.schema_edges = []  # (src_node label, relation label, dst_node label)
+        self.dsl_matches = []
         self.fixed_Return_statement = None
         self.variable_to_label = {}
         self.labels_to_properties = {}
+        self.constants = []
+        self.num_sketches = 0  # progress of the search
+        self.num_candidates = 0
+        self.num_queries = 0
+        self._stats_lock = threading.Lock()  # queries are counted on worker threads in parallel search
+        self._budget = None  # of the running search, see _check_budget
+        self._pool = None  # worker threads of the running search, see _worker_pool
 
         self._collect_symbols()
+        self._build_schema()
         self._fix_Return_statement()
+        self.estimator = SearchSpaceEstimator(self)
 
-    def synthesize(self) -> None:
+    def synthesize(self, max_sketch_size: int = MAX_SKETCH_SIZE, budget: Budget = None, checkpoint: Checkpoint = None,
+                   checkpoint_interval: float = 60.0) -> str:
         """
         Main algorithm of the synthesizer
 
         1. create DSL sketch
         2. complete the sketch
-        3. translate completed sketch to Cypher
-        4. validate Cypher
+        3. validate completed sketch with the evaluator
+        4. translate valid one to Cypher (and confirm it on database)
         5. if not valid, check next sketch
         6. expand sketch
+
+        Sketches are checked from the cheapest, up to ```max_sketch_size``` statements.
+        If none is valid, or ```budget``` is exhausted first, SynthesisNotFound is raised.
+
+        If ```checkpoint``` is given, the search state is saved to it every ```checkpoint_interval``` seconds
+        and when the budget is exhausted, and a search saved there before is resumed.
         """
-        # create sketch set
-        sketch = Queue()
-        sketch.put([dsl.Match, dsl.Return])  # the simpliest sketch
+        if self.result_store is None:
+            return self._search(max_sketch_size, budget, checkpoint, checkpoint_interval)
+
+        # the same example(s) is synthesized before
+        fingerprint = examples_fingerprint(self.examples)
+        stored = self.result_store.get(fingerprint, self.undirected_relations, max_sketch_size)
+        if stored is not None:
+            return stored["query"]
+
+        start = time.perf_counter()
+        query = self._search(max_sketch_size, budget, checkpoint, checkpoint_interval)
+        self.result_store.put(fingerprint, self.undirected_relations, max_sketch_size,
+                              query, time.perf_counter() - start)
+        return query
+
+    def _search(self, max_sketch_size: int, budget: Budget = None, checkpoint: Checkpoint = None,
+                checkpoint_interval: float = 60.0) -> str:
+        """
+        search all sketches for a valid query, resume from ```checkpoint``` if it holds a search of the example
+        """
+        sorted_target_result = self._prepare_search()
+
+        self._budget = budget if budget is not None else Budget()
+        self._budget.start()
+        self._checkpoint = checkpoint
+        self._checkpoint_interval = checkpoint_interval
+        self._last_checkpoint = time.perf_counter()
+        self._max_sketch_size = max_sketch_size
+        self._elapsed_before = 0.0  # seconds spent before the resumed checkpoint
+
+        state = None
+        if checkpoint is not None:
+            # the order of examples changes the order of candidates (see _collect_symbols)
+            self._fingerprint = examples_fingerprint(self.examples)
+            self._example_fingerprints = [example.fingerprint() for example in self.examples]
+            state = checkpoint.load(self._fingerprint, self._example_fingerprints, max_sketch_size,
+                                    self.undirected_relations)
+        if state is not None:
+            self.num_sketches = state["num_sketches"]
+            self.num_candidates = state["num_candidates"]
+            self.num_queries = state["num_queries"]
+            self._elapsed_before = state["seconds"]
+        self._queries_before = self.num_queries  # the budget is for this run
+        self._progress = False  # no batch is validated in this run yet
+
+        query = None
+        try:
+            # hold one database session (per thread) for the whole search
+            with self.evaluator.session(), self._worker_pool() as self._pool:
+                for sketch_index, sketch_to_check in enumerate(self._sketches(max_sketch_size)):
+                    cursor = 0
+                    if state is not None:
+                        if sketch_index < state["sketch_index"]:
+                            continue  # finished before the checkpoint
+                        self.pruner.restore(pickle.loads(state["pruner"]))
+                        cursor = state["cursor"]
+                        state = None
+                    else:
+                        self.num_sketches += 1
+
+                    self._start_sketch(sketch_index, cursor)
+                    sketch_start = time.perf_counter()
+                    before = self.metrics.snapshot() if self.metrics.enabled else None
+
+                    # complete the sketch lazily and validate it
+                    candidates = self._candidates(sketch_to_check)
+                    for _ in islice(candidates, cursor):
+                        pass  # validated before the checkpoint, only replayed through the pruner
+                    query = self._validate(candidates, sorted_target_result)
+
+                    if self.verdict_cache is not None:
+                        self.verdict_cache.commit()
 
+                    if before is not None:
+                        self.metrics.emit("sketch", sketch=_sketch_name(sketch_to_check), found=query is not None,
+                                          seconds=time.perf_counter() - sketch_start,
+                                          **snapshot_delta(before, self.metrics.snapshot()))
+
+                    if query is not None:
+                        if checkpoint is not None:
+                            checkpoint.remove()
+                        return query  # found valid query
+
+            if checkpoint is not None:
+                checkpoint.remove()
+            raise self._not_found(REASON_SIZE_LIMIT)
+        finally:
+            if self.metrics.enabled:
+                self.metrics.emit("search", found=query is not None, seconds=self._budget.elapsed(),
+                                  num_sketches=self.num_sketches, num_candidates=self.num_candidates,
+                                  num_queries=self.num_queries, **self.metrics.snapshot())
+
+    def _prepare_search(self) -> List[tuple]:
+        """
+        reset the state of a search, and return the sorted target result of the first example
+        """
         # pre-process target result
         # so could check if another query result match this easily
-        sorted_target_result = [tuple(record.values)  for record in self.example.output]
-        sorted_target_result.sort()
+        self.sorted_targets = [sorted(tuple(record.values) for record in example.output) for example in self.examples]
+
+        # equivalent programs are only evaluated once per search
+        in_memory = [evaluator if isinstance(evaluator, InMemoryEvaluator) else InMemoryEvaluator(example)
+                     for evaluator, example in zip(self.evaluators, self.examples)]
+        self.pruner = CandidatePruner(in_memory)
+
+        self.num_sketches = 0
+        self.num_candidates = 0
+        self.num_queries = 0
+        self._budget = None
+
+        return self.sorted_targets[0]
+
+    def _start_sketch(self, sketch_index: int, cursor: int) -> None:
+        """
+        remember where the search is, so it could be checkpointed in the middle of the sketch
+        """
+        self._sketch_index = sketch_index
+        self._cursor = cursor
+        self._sketch_pruner = pickle.dumps(self.pruner.state()) if self._checkpoint is not None else None
+
+    def _batch_rejected(self, batch_size: int) -> None:
+        """
+        Account a batch of candidates without a valid one, then check the budget
+        """
+        self._cursor += batch_size
+        self.num_candidates += batch_size
+        self._progress = True
+        self._check_budget()
+
+    def _check_budget(self) -> None:
+        """
+        Checkpoint the search if it is time to, and stop it if the budget is exhausted.
+        Checked after each batch, and once per prefix while completing a sketch
+        (completing and pruning could take long between two batches).
+        The search is not stopped before its first batch,
+        so a resumed search always moves on from its checkpoint.
+        """
+        if self._budget is None or not self._progress:
+            return  # not in _search (e.g. dry_run), or replaying the checkpoint
+
+        reason = self._budget.exceeded(self.num_queries - self._queries_before)
+        if self._checkpoint is not None and \
+                (reason is not None or time.perf_counter() - self._last_checkpoint >= self._checkpoint_interval):
+            self._save_checkpoint()
+
+        if reason is not None:
+            raise self._not_found(reason)
 
-        for _ in range(10):  # let there be a limit on size of sketch
+    def _save_checkpoint(self) -> None:
+        if self.verdict_cache is not None:
+            self.verdict_cache.commit()
+
+        self._checkpoint.save({
+            "fingerprint": self._fingerprint,
+            "example_fingerprints": self._example_fingerprints,
+            "max_sketch_size": self._max_sketch_size,
+            "undirected_relations": self.undirected_relations,
+            "sketch_index": self._sketch_index,
+            "cursor": self._cursor,
+            "pruner": self._sketch_pruner,
+            "num_sketches": self.num_sketches,
+            "num_candidates": self.num_candidates,
+            "num_queries": self.num_queries,
+            "seconds": self._elapsed_before + self._budget.elapsed(),
+        })
+        self._last_checkpoint = time.perf_counter()
+
+    def _not_found(self, reason: str) -> SynthesisNotFound:
+        # nothing to resume once every sketch is checked
+        checkpoint_path = None
+        if self._checkpoint is not None and reason != REASON_SIZE_LIMIT:
+            checkpoint_path = str(self._checkpoint.path)
+
+        return SynthesisNotFound(reason, self.num_sketches, self.num_candidates, self.num_queries,
+                                 self._elapsed_before + self._budget.elapsed(), checkpoint_path)
+
+    def _sketches(self, max_sketch_size: int) -> Iterator[List[dsl.DSL.__subclasses__]]:
+        """
+        Generate all sketches with at most ```max_sketch_size``` statements, the cheapest first
+        """
+        # create sketch set
+        scheduler = SketchScheduler(self._estimate_sketch, max_sketch_size)
+        scheduler.push([dsl.Match, dsl.Return])  # the simpliest sketch
+
+        while scheduler:
             # get next sketch
-            sketch_to_check = sketch.get()
-            
-            # complete the sketch
-            search_space = self._complete_sketch(sketch_to_check)
-
-            # translate DSL to Cypher
-            for dsl_program in search_space:
-                cypher_statements = []
-                for i, statement in enumerate(dsl_program):
-                    if isinstance(statement, dsl.Require):
-                        # for multiple Require statements
-                        # combine them into one
-                        cypher_statements.append(statement.to_Cypher(dsl_program[i+1:-1]))
-                        cypher_statements.append(dsl_program[-1].to_Cypher())
+            sketch_to_check = scheduler.pop()
+            yield sketch_to_check
+
+            # expand sketch space (program size increase by 1)
+            scheduler.push(sketch_to_check[:-1] + [dsl.Require, dsl.Return])  # choice 1: add a new Require
+            scheduler.push([dsl.Match] + sketch_to_check)  # choice 2: add a new Match
+
+    def _estimate_sketch(self, sketch: List[dsl.DSL.__subclasses__]) -> float:
+        """
+        Estimated cost of a sketch: its candidates after pruning, each weighted by the rows it binds
+        (see SearchSpaceEstimator.cost)
+        """
+        return self.estimator.cost(sketch)
+
+    def dry_run(self, max_sketch_size: int = MAX_SKETCH_SIZE, num_samples: int = 20) -> List[Dict]:
+        """
+        Estimate the search without running it.
+
+        For each sketch, print the number of candidates before and after each pruning rule,
+        and the estimated time to complete (and prune) and to validate all of them (see _measure_sketch).
+        Return the printed rows.
+        """
+        sorted_target_result = self._prepare_search()
+
+        print(f"{'sketch':<50}" + "".join(f"{rule:>12}" for rule in ["none"] + RULES)
+              + f"{'completion':>12}{'query':>12}{'seconds':>12}")
+
+        rows = []
+        total_seconds = 0
+        with self.evaluator.session():
+            for sketch in self._sketches(max_sketch_size):
+                counts = self.estimator.count_by_rule(sketch)
+                completion, validation = self._measure_sketch(sketch, sorted_target_result, num_samples)
+                seconds = completion + validation
+                total_seconds += seconds
+
+                name = _sketch_name(sketch)
+                print(f"{name:<50}" + "".join(f"{count:>12}" for _, count in counts)
+                      + f"{completion:>12.2f}{validation:>12.2f}{seconds:>12.2f}")
+                rows.append({"sketch": name, "counts": dict(counts), "completion_seconds": completion,
+                             "query_seconds": validation, "seconds": seconds})
+
+        self._prepare_search()  # samples are marked as seen by the pruner
+        print(f"estimated total: {total_seconds:.2f}s (at most: programs equivalent to a previous one are counted too)")
+        return rows
+
+    def _measure_sketch(self, sketch: List[dsl.DSL.__subclasses__], sorted_target_result: List[tuple],
+                        num_samples: int) -> Tuple[float, float]:
+        """
+        Estimated seconds to complete (and prune) all candidates of ```sketch```, and to validate them,
+        measured on its first ```num_samples``` candidates.
+
+        The completion time per candidate is multiplied by the estimated number of candidates.
+        The validation time grows with the rows a candidate binds, and the first candidates usually bind
+        fewer rows than the rest of the sketch: the validation time per unit of cost (a unit for each candidate
+        and for each row its Match statements bind on the examples) is multiplied by the estimated cost
+        of the sketch (see SearchSpaceEstimator.cost).
+        """
+        start = time.perf_counter()
+        samples = list(islice(self._candidates(sketch), num_samples))
+        completion = time.perf_counter() - start
+        if not samples:
+            return 0.0, 0.0
+
+        start = time.perf_counter()
+        for program in samples:
+            self.evaluator.check(program, sorted_target_result)
+        validation = time.perf_counter() - start
+
+        num_matches = sketch.count(dsl.Match)
+        cost = len(samples) + sum(len(evaluator.bindings(program[:num_matches]))
+                                  for evaluator in self.pruner.evaluators for program in samples)
+        return (completion / len(samples) * self.estimator.count(sketch),
+                validation / cost * self.estimator.cost(sketch))
+
+    def _validate(self, candidates: Iterator[List[dsl.DSL]], sorted_target_result: List[tuple]) -> Optional[str]:
+        """
+        Validate candidates in batches, stop at the first batch with a valid program
+        Return the Cypher query of the first valid program, or None
+        """
+        if self.workers > 1:
+            return self._validate_parallel(candidates, sorted_target_result)
+
+        while True:
+            with self.metrics.timer(PHASE_COMPLETION):
+                batch = list(islice(candidates, self.evaluator.batch_size))
+            if not batch:
+                return None
+
+            # check whether the result is valid
+            verdicts = self._check_batch(batch, sorted_target_result)
+            for dsl_program, verdict in zip(batch, verdicts):
+                if verdict and self._confirm(dsl_program, sorted_target_result):
+                    self.num_candidates += len(batch)
+                    return dsl.translate(dsl_program)
+
+            self._batch_rejected(len(batch))
+
+    def _validate_parallel(self, candidates: Iterator[List[dsl.DSL]], sorted_target_result: List[tuple]) -> Optional[str]:
+        """
+        Validate batches of candidates on a pool of ```workers``` threads.
+
+        Batches are checked in the order they are generated,
+        so the result is the first valid program in candidate order,
+        no matter which worker finishes first.
+        Once it is found, outstanding batches are cancelled.
+        """
+        stop = threading.Event()
+        pending = {}  # batch number -> (batch, future)
+        next_batch = 0  # the next batch to check
+        num_batches = 0
+
+        try:
+            while True:
+                # keep every worker busy, with a bounded number of batches generated ahead
+                while len(pending) < 2 * self.workers:
+                    with self.metrics.timer(PHASE_COMPLETION):
+                        batch = list(islice(candidates, self.evaluator.batch_size))
+                    if not batch:
                         break
-                    else:
-                        cypher_statements.append(statement.to_Cypher())
+                    future = self._pool.submit(self._validate_batch, batch, sorted_target_result, stop)
+                    pending[num_batches] = (batch, future)
+                    num_batches += 1
 
-                query = "\n".join(cypher_statements)
-                result = self.database.query(query)
+                if next_batch not in pending:
+                    return None  # all candidates are checked
 
-                # check whether the result is valid
-                if len(result) == len(self.example.output):
-                    sorted_result = [tuple(record.values())  for record in result]
-                    sorted_result.sort()
+                batch, future = pending.pop(next_batch)
+                next_batch += 1
 
-                    # compare two sorted tuple
-                    if sorted_result == sorted_target_result:
-                        return query  # found valid query
-            
-            # expand sketch space (program size increase by 1)
-            sketch.put(sketch_to_check[:-1] + [dsl.Require, dsl.Return])  # choice 1: add a new Require
-            sketch.put([dsl.Match] + sketch_to_check)  # choice 2: add a new Match
+                for dsl_program, verdict in zip(batch, future.result()):
+                    if verdict and self._confirm(dsl_program, sorted_target_result):
+                        self.num_candidates += len(batch)
+                        return dsl.translate(dsl_program)
 
-        print("reach program size limit")
-        exit(1)
+                self._batch_rejected(len(batch))
+        finally:
+            # cancel all outstanding work, and wait for the running batches
+            # (the pool is kept for the next sketch)
+            stop.set()
+            for _, future in pending.values():
+                future.cancel()
+            wait([future for _, future in pending.values()])
 
-    def _complete_sketch(self, sketch: List[dsl.DSL.__subclasses__]) -> List[List[dsl.DSL]]:
-        """
-        Generate a search space with all possible assignment to the sketch
-        """
-        search_space_levels = []  # list of all levels of completed sketch
-        possible_variables = []   # (just to speed up variable lookup) list of corresponding variables set at each level 
-        for level in range(len(sketch)):  # BFS
-            # each loop is a level in the tree
-            # and each level contains all possible completed sketch spawned from the last level
-            # example: for sketch[Match, Return]
-            # level 0 is list of all possible Match statement
-            # level 1 is list of all possible [Match, Return] combinations
-
-            # create new level
-            current_level = []
-            current_possible_variables = []
-
-            # get data in last level
-            if level >= 1:
-                last_level = search_space_levels[level - 1]
-                last_possible_variables = possible_variables[level - 1]
-            else:
-                last_level = []
-                last_possible_variables = set()
-
-            # get the next DSL statement
-            dsl_class = sketch[level]
-
-            # complete DSL statement
-            if dsl_class == dsl.Match:
-                for node in self.dsl_nodes:
-                    # case 1: single node
-                    if not last_level:
-                        current_level.append([dsl.Match(node)])
-                    else:  # add new statement to every previous statements
-                        current_level.extend([x + [dsl.Match(node)] for x in last_level])
-
-                    # use set to avoid duplication
-                    if not last_possible_variables:
-                        current_possible_variables.append({node.variable})
-                    else:
-                        current_possible_variables.extend([x | {node.variable} for x in last_possible_variables])
-
-                    # case 2: a relation with two nodes
-                    for rel in self.dsl_relations:
-                        for node2 in self.dsl_nodes:
-                            if not last_level:
-                                current_level.append([dsl.Match(node, rel, node2)])
-                            else:  # add new statement to every previous statements
-                                current_level.extend([x + [dsl.Match(node, rel, node2)] for x in last_level])
-                            
-                            if not last_possible_variables:
-                                current_possible_variables.append({node.variable, rel.variable, node2.variable})
-                            else:
-                                current_possible_variables.extend([x | {node.variable, rel.variable, node2.variable} for x in last_possible_variables])
-            elif dsl_class == dsl.Return:
-                # the Return statemen is pre-processed
-                # so only the variables fields are blank
-                # just pick them from last level's variables list
-                num_variables = len(self.fixed_Return_statement.properties)
-
-                # Return statement will not be the first statement in the query
-                # and since there exist at least a Match
-                # it is gurantee that last_possible_variables and last_level is not empty
-                for variable_set, previous_statements in zip(last_possible_variables, last_level):
-                    # permutation with replacement of all variables
-                    for variables_choice in product(variable_set, repeat=num_variables):
-                        current_level.append(previous_statements + 
-                            [dsl.Return(self.fixed_Return_statement.properties, variables_choice)])
+    @contextmanager
+    def _worker_pool(self) -> Iterator[Optional[ThreadPoolExecutor]]:
+        """
+        A pool of ```workers``` threads for the whole search (None if there is only one worker).
+        Each thread holds its own evaluator session (sessions are not thread safe),
+        they are closed after the pool is shut down.
+        """
+        if self.workers <= 1:
+            yield None
+            return
+
+        lock = threading.Lock()
+        with ExitStack() as sessions:
+            def hold_session():
+                with lock:
+                    sessions.enter_context(self.evaluator.session())
+
+            with ThreadPoolExecutor(max_workers=self.workers, initializer=hold_session) as pool:
+                yield pool
+
+    def _validate_batch(self, batch: List[List[dsl.DSL]], sorted_target_result: List[tuple],
+                        stop: threading.Event) -> List[bool]:
+        """
+        run on a worker thread (holding its session, see _worker_pool)
+        """
+        if stop.is_set():
+            return [False] * len(batch)
+
+        return self._check_batch(batch, sorted_target_result)
+
+    def _check_batch(self, batch: List[List[dsl.DSL]], sorted_target_result: List[tuple]) -> List[bool]:
+        """
+        verdicts of a batch of candidates (```sorted_target_result``` is the target of the first example),
+        the ones in the verdict cache (keyed on canonical Cypher) are not validated again
+        """
+        if self.verdict_cache is None:
+            return [verdict for verdict, _ in self._check_examples(batch, sorted_target_result)]
+
+        with self.metrics.timer(PHASE_TRANSLATION):
+            keys = [dsl.translate(canonical_program(program)) for program in batch]
+        checked = [self.verdict_cache.get(key) for key in keys]
+
+        missing = [i for i, known in enumerate(checked) if known is None]
+        self.metrics.count(CANDIDATES_CACHED, len(batch) - len(missing))
+        if missing:
+            results = self._check_examples([batch[i] for i in missing], sorted_target_result)
+            for i, (verdict, row_count) in zip(missing, results):
+                self.verdict_cache.put(keys[i], verdict, row_count)
+                checked[i] = (verdict, row_count)
+
+        return [verdict for verdict, _ in checked]
+
+    def _check_examples(self, batch: List[List[dsl.DSL]],
+                        sorted_target_result: List[tuple]) -> List[Tuple[bool, Optional[int]]]:
+        """
+        Validate a batch of candidates on each example in the adaptive order (see ExampleOrder),
+        a candidate rejected by an example is not validated on the rest.
+        Return the verdicts, and the number of rows of the result (only known for a single example)
+        """
+        if len(self.examples) == 1:
+            self._count_queries(len(batch))
+            return self.evaluator.check_batch(batch, sorted_target_result)
+
+        targets = [sorted_target_result] + self.sorted_targets[1:]
+        verdicts = [(True, None)] * len(batch)
+        remaining = list(range(len(batch)))  # candidates passing every example so far
+        for index in self.example_order.order():
+            if not remaining:
+                break
+
+            start = time.perf_counter()
+            self._count_queries(len(remaining))
+            results = self.evaluators[index].matches_batch([batch[i] for i in remaining], targets[index])
+
+            passed = []
+            for i, verdict in zip(remaining, results):
+                if verdict:
+                    passed.append(i)
+                else:
+                    verdicts[i] = (False, None)
+
+            self.example_order.record(index, len(remaining), len(remaining) - len(passed),
+                                      time.perf_counter() - start)
+            remaining = passed
+
+        return verdicts
+
+    def _count_queries(self, num_queries: int) -> None:
+        self.metrics.count(CANDIDATES_QUERIED, num_queries)
+        with self._stats_lock:
+            self.num_queries += num_queries
+
+    def _confirm(self, program: List[dsl.DSL], sorted_target_result: List[tuple]) -> bool:
+        """
+        confirm a valid program on the database, if there is one
+        """
+        if self.database is None:
+            return True
 
+        return CypherEvaluator(self.database).matches(program, sorted_target_result)
+
+    def _candidates(self, sketch: List[dsl.DSL.__subclasses__]) -> Iterator[List[dsl.DSL]]:
+        """
+        Completed programs of the sketch, without the ones equivalent to an evaluated program
+        """
+        metrics = self.metrics
+        for program in self._complete_sketch(sketch):
+            if metrics.enabled:
+                metrics.count(CANDIDATES_GENERATED)
+
+            if self.pruner is None or not self.pruner.is_duplicate(program):
+                yield program
+            elif metrics.enabled:
+                metrics.count(CANDIDATES_PRUNED)
+
+    def _complete_sketch(self, sketch: List[dsl.DSL.__subclasses__]) -> Iterator[List[dsl.DSL]]:
+        """
+        Lazily generate all possible assignment to the sketch
+
+        Programs are generated depth first, so validation could start on the first one
+        and the rest are never built once a valid program is found.
+        The order is defined by the statements of the sketch:
+        Match follows dsl_nodes and dsl_relations order (single node before relations),
+        Require and Return follow the sorted variables.
+        """
+        yield from self._complete_statement(sketch, [], set())
+
+    def _complete_statement(self, sketch: List[dsl.DSL.__subclasses__], program: List[dsl.DSL],
+                            variables: Set[str]) -> Iterator[List[dsl.DSL]]:
+        """
+        Complete the next statement ```sketch[len(program)]``` of a partial program.
+        ```variables``` are the variables introduced by ```program```
+        """
+        dsl_class = sketch[len(program)]
+
+        if dsl_class == dsl.Match:
+            # only patterns allowed by the schema
+            for match in self.dsl_matches:
+                yield from self._extend(sketch, program, variables, match, match.variables())
+        elif dsl_class == dsl.Return:
+            # the Return statemen is pre-processed
+            # so only the variables fields are blank
+            # just pick them from the variables of previous statements
+            properties = self.fixed_Return_statement.properties
+            self._check_budget()
+
+            # Return statement will not be the first statement in the query
+            # and since there exist at least a Match
+            # it is gurantee that variables is not empty
+            # only variables whose column contains all values of the output column could be picked
+            possible_variables = []
+            for i, property in enumerate(properties):
+                possible_variables.append([v for v in sorted(variables)
+                                           if self.provenance.allows(i, self.variable_to_label[v], property)])
+            if not all(possible_variables):
+                return  # no Return to pick, no need to evaluate the prefix
+
+            # every Return over an observationally equivalent prefix is already rejected
+            if self.pruner is not None and self.pruner.is_equivalent_prefix(program, variables):
+                self.metrics.count(PREFIXES_PRUNED)
+                return
+
+            # permutation with replacement of the possible variables
+            for variables_choice in product(*possible_variables):
                 # Return statement should be the last statement
-                return current_level
-            elif dsl_class == dsl.Require:
-                # choice 1: EqualTo
-                for variable_set, previous_statements in zip(last_possible_variables, last_level):
-                    for variable in variable_set:
-                        label = self.variable_to_label[variable]
-                        for property in self.labels_to_properties[label]:
-                            for constant in self.example.constants:
-                                current_level.append(previous_statements + 
-                                    [dsl.Require(dsl.EqualTo(property, variable, constant))])
-                                current_possible_variables.append(variable_set.copy())  # variable unchanged
-            else:
-                raise RuntimeError(f"Illegall DSL: {dsl_class}")
-
-            # save current level
-            search_space_levels.append(current_level)
-            possible_variables.append(current_possible_variables)
+                yield program + [dsl.Return(properties, variables_choice)]
+        elif dsl_class == dsl.Require:
+            # choice 1: EqualTo
+            for require in self._possible_EqualTo(variables):
+                # variable unchanged
+                yield from self._extend(sketch, program, variables, require, set())
+        else:
+            raise RuntimeError(f"Illegall DSL: {dsl_class}")
+
+    def _possible_EqualTo(self, variables: Set[str]) -> List[dsl.Require]:
+        """
+        All EqualTo conditions on ```variables``` ranked by the constant index.
+        A condition that matches no row could never be true (unless the output is empty),
+        and one that matches every row filters nothing, so it is tried last.
+        """
+        selective = []
+        unselective = []
+        for variable in sorted(variables):
+            label = self.variable_to_label[variable]
+            for property in self.labels_to_properties[label]:
+                for constant in self.constants:
+                    is_selective = self.classify_EqualTo(label, property, constant)
+                    require = dsl.Require(dsl.EqualTo(property, variable, constant))
+
+                    if is_selective is None:
+                        continue
+                    elif is_selective:
+                        selective.append(require)
+                    else:
+                        unselective.append(require)
+
+        return selective + unselective
+
+    def classify_EqualTo(self, label: str, property: str, constant: str) -> Optional[bool]:
+        """
+        Rank the condition ```label```.```property``` = ```constant``` by the constant index of each example:
+        None if it matches no row of an example whose output is not empty (it could never be valid),
+        False if it matches no row or every row of each example (it filters nothing),
+        True otherwise
+        """
+        is_selective = False
+        for example in self.examples:
+            count = example.constant_count(constant, label, property)
+            if count == 0 and example.output:
+                return None
+            if 0 < count < example.row_count(label):
+                is_selective = True
+
+        return is_selective
+
+    def _extend(self, sketch: List[dsl.DSL.__subclasses__], program: List[dsl.DSL], variables: Set[str],
+                statement: dsl.DSL, new_variables: Set[str]) -> Iterator[List[dsl.DSL]]:
+        """
+        append ```statement``` to the partial program and complete the rest of sketch
+        """
+        program.append(statement)
+        yield from self._complete_statement(sketch, program, variables | new_variables)
+        program.pop()
 
     def _collect_symbols(self):
         """
-        prepare node_labels, node_properties, relation_labels, relation_properties, variable_to_label
+        prepare node_labels, node_properties, relation_labels, relation_properties, variable_to_label, constants
         And create corresponding DSL object.
         these will be used to complete sketch.
+        With several examples, the labels, properties and constants of all examples are collected.
         """
-        self.node_labels = list(self.example.nodes.keys())
+        for example in self.examples:
+            for label, table in example.nodes.items():
+                properties = self.node_properties.setdefault(label, [])
+                properties.extend(p for p in table.properties if p not in properties)
+            for label, table in example.relations.items():
+                properties = self.relation_properties.setdefault(label, [])
+                properties.extend(p for p in table.properties if p not in properties)
+            self.constants.extend(c for c in example.constants if c not in self.constants)
+
+        self.node_labels = list(self.node_properties.keys())
         for label in self.node_labels:
-            properties = self.example.nodes[label][0].properties.keys()
-            self.node_properties[label] = properties
-            
             # create DSL Node object, and use <node{number}> as variable
             variable = f"node{len(self.dsl_nodes)}"
             self.variable_to_label[variable] = label
             self.dsl_nodes.append(dsl.Node(label, variable))
         
-        self.relation_labels = list(self.example.relations.keys())
+        self.relation_labels = list(self.relation_properties.keys())
         for label in self.relation_labels:
-            properties = self.example.relations[label][0].properties.keys()
-            self.relation_properties[label] = properties
-
             # create DSL Relation object, and use <rel{number}> as variable
             variable = f"rel{len(self.dsl_relations)}"
             self.variable_to_label[variable] = label
-            self.dsl_relations.append(dsl.Relation(label, variable))
+            self.dsl_relations.append(dsl.Relation(label, variable, not self.undirected_relations))
 
         self.labels_to_properties = self.node_properties.copy()
         self.labels_to_properties.update(self.relation_properties)
 
+    def _build_schema(self):
+        """
+        prepare schema_edges from the endpoint labels of each relation,
+        and all Match statements that could return rows:
+        a single node, or a relation between the nodes of its endpoint labels.
+        Undirected relations are only matched from src_node, since the other direction is the same.
+        """
+        label_to_node = {node.label: node for node in self.dsl_nodes}
+
+        for rel in self.dsl_relations:
+            endpoints = {e.relation_endpoints[rel.label] for e in self.examples if rel.label in e.relation_endpoints}
+            if len(endpoints) > 1:
+                raise RuntimeError(f"Examples have different endpoints of {rel.label}: {endpoints}")
+
+            src_label, dst_label = endpoints.pop()
+            if src_label in label_to_node and dst_label in label_to_node:
+                self.schema_edges.append((src_label, rel.label, dst_label))
+
+        for node in self.dsl_nodes:
+            # case 1: single node
+            self.dsl_matches.append(dsl.Match(node))
+
+            # case 2: a relation with two nodes
+            for src_label, rel_label, dst_label in self.schema_edges:
+                if src_label == node.label:
+                    rel = self.dsl_relations[self.relation_labels.index(rel_label)]
+                    self.dsl_matches.append(dsl.Match(node, rel, label_to_node[dst_label]))
+
     def _fix_Return_statement(self):
         """
         Trick: the Return DSL statement is always the same across all sketchs (except variables).
         This is because part of the Return statement always match the output table.
         So we could fix it in advance to reduce search space.
         """
-        properties = self.example.output[0].keys
+        keys = {tuple(example.output[0].keys) for example in self.examples if example.output}
+        if len(keys) > 1:
+            raise RuntimeError(f"Examples have different output columns: {keys}")
+
+        properties = list(keys.pop())
         self.fixed_Return_statement = dsl.Return(properties, None)  # variables is left blank, will be filled later
 
 
+def _sketch_name(sketch: List[dsl.DSL.__subclasses__]) -> str:
+    return " ".join(dsl_class.__name__ for dsl_class in sketch)
+
+
 if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Synthesize Cypher query from I/O examples")
+    parser.add_argument("paths", nargs="*", default=["example/example2"],
+                        help="directories of examples of the same query (the first one is loaded to the database)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only print the estimated search space and time of each sketch")
+    parser.add_argument("--max-sketch-size", type=int, default=MAX_SKETCH_SIZE,
+                        help="number of statements of the largest sketch searched")
+    parser.add_argument("--undirected-relations", action="store_true",
+                        help="match relations in either direction")
+    parser.add_argument("--time-limit", type=float, help="wall-clock budget of the search in seconds")
+    parser.add_argument("--max-queries", type=int, help="budget of candidates validated by the search")
+    parser.add_argument("--memory-limit", type=float, help="budget of peak memory in MB")
+    parser.add_argument("--checkpoint", help="file to save the search state to, and to resume it from")
+    parser.add_argument("--metrics", help="file to write the metrics of each sketch to (JSON lines)")
+    parser.add_argument("--result-store", default=RESULT_STORE_PATH,
+                        help=f"JSON file of finished results, an example found before is not searched again "
+                             f"(default: {RESULT_STORE_PATH})")
+    parser.add_argument("--verdict-cache", help="SQLite file to remember verdicts of candidates in across runs")
+    args = parser.parse_args()
+
+    # parse example from files
+    examples = []
+    for path in args.paths:
+        examples.append(Example(path))
+        print(f"Parsed {path}: {examples[-1].parse_throughput()}")
+    example = examples[0]
+    path = ", ".join(args.paths)
+
+    if args.dry_run:
+        Synthesizer(examples, undirected_relations=args.undirected_relations).dry_run(args.max_sketch_size)
+        exit(0)
+
+    # the same example is synthesized before (with the same options), no need to touch the database
+    result_store = ResultStore(args.result_store)
+    stored = result_store.get(examples_fingerprint(examples), args.undirected_relations, args.max_sketch_size)
+    if stored is not None:
+        print(f"Found stored query of {path} (the search took {stored['seconds']:.2f}s):")
+        print(stored["query"])
+        exit(0)
+
+    metrics_file = open(args.metrics, "a") if args.metrics else None
+    metrics = Metrics([JsonLinesSink(metrics_file)]) if metrics_file else None
+
     # create database connection
-    database = CypherDatabase("bolt://localhost:7687", "neo4j", "password")
+    database = CypherDatabase("bolt://localhost:7687", "neo4j", "password", metrics=metrics)
     database.clear_all()
 
-    # parse example from files
-    path = "example/example2"
-    example = Example(path)
-    database.create_database_from_example(example)
+    num_rows, seconds = database.create_database_from_example(example)
+    print(f"Loaded {num_rows} nodes and relations in {seconds:.2f}s ({num_rows / max(seconds, 1e-9):.0f} rows/s)")
     print(f"Synthesize on {path}\n...")
 
     # launch synthesizer
-    synthesizer = Synthesizer(example, database)
-    query = synthesizer.synthesize()
+    verdict_cache = VerdictCache(args.verdict_cache) if args.verdict_cache else None
+    synthesizer = Synthesizer(examples, database, undirected_relations=args.undirected_relations,
+                              verdict_cache=verdict_cache, result_store=result_store, metrics=metrics)
+    budget = Budget(args.time_limit, args.max_queries, args.memory_limit)
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    try:
+        query = synthesizer.synthesize(args.max_sketch_size, budget, checkpoint)
+    except SynthesisNotFound as e:
+        print(e)
+        database.close()
+        exit(1)
+    finally:
+        if metrics_file:
+            metrics_file.close()
+        if verdict_cache is not None:
+            verdict_cache.close()
+
     print("Found target query:")
     print(query)
     # database.print_all()
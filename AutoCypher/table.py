@@ -0,0 +1,191 @@
+from typing import List, Dict, Iterator, Optional
+from collections.abc import Mapping, Sequence
+from array import array
+
+from record import Node, Relation
+
+class StringPool:
+    """
+    Interned property values, each distinct string is stored once and referred by an integer id
+    """
+    __slots__ = ("values", "ids")
+    values: List[str]  # id -> value
+    ids: Dict[str, int]  # value -> id
+
+    def __init__(self) -> None:
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value: str) -> int:
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.ids[value] = value_id
+            self.values.append(value)
+        return value_id
+
+    def id_of(self, value: str) -> Optional[int]:
+        """
+        id of ```value```, or None if it is not in any column
+        """
+        return self.ids.get(value)
+
+
+class Table(Sequence):
+    """
+    All nodes of a label, stored by column
+
+    ```ids```: the id of each row
+    ```columns```: property -> the interned value id of each row (see StringPool)
+
+    Rows are read as NodeView objects (table[row], or iterate the table),
+    which have the same API as record.Node.
+    """
+    __slots__ = ("label", "pool", "properties", "ids", "columns")
+    label: str
+    pool: StringPool
+    properties: List[str]
+    ids: array
+    columns: Dict[str, array]
+
+    def __init__(self, label: str, pool: StringPool, properties: List[str]) -> None:
+        self.label = label
+        self.pool = pool
+        self.properties = properties
+        self.ids = array("q")
+        self.columns = {property: array("i") for property in properties}
+
+    def append(self, row_id: int, values: List[str]) -> None:
+        """
+        add a row, ```values``` are in the order of ```properties```
+        """
+        self.ids.append(row_id)
+        for property, value in zip(self.properties, values):
+            self.columns[property].append(self.pool.intern(value))
+
+    def value(self, row: int, property: str) -> str:
+        return self.pool.values[self.columns[property][row]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, row: int) -> "NodeView":
+        if not 0 <= row < len(self.ids):
+            raise IndexError(f"{self.label} has no row {row}")
+        return NodeView(self, row)
+
+    def __iter__(self) -> Iterator["NodeView"]:
+        return (NodeView(self, row) for row in range(len(self.ids)))
+
+
+class RelationTable(Table):
+    """
+    All relations of a label, stored by column
+
+    ```src_rows```, ```dst_rows```: the row of the endpoints of each relation in ```src_table```, ```dst_table```
+
+    Rows are read as RelationView objects, which have the same API as record.Relation.
+    """
+    __slots__ = ("src_table", "dst_table", "src_rows", "dst_rows")
+    src_table: Table
+    dst_table: Table
+    src_rows: array
+    dst_rows: array
+
+    def __init__(self, label: str, pool: StringPool, properties: List[str], src_table: Table,
+                 dst_table: Table) -> None:
+        super().__init__(label, pool, properties)
+        self.src_table = src_table
+        self.dst_table = dst_table
+        self.src_rows = array("i")
+        self.dst_rows = array("i")
+
+    def append_relation(self, row_id: int, src_row: int, dst_row: int, values: List[str]) -> None:
+        self.append(row_id, values)
+        self.src_rows.append(src_row)
+        self.dst_rows.append(dst_row)
+
+    def __getitem__(self, row: int) -> "RelationView":
+        if not 0 <= row < len(self.ids):
+            raise IndexError(f"{self.label} has no row {row}")
+        return RelationView(self, row)
+
+    def __iter__(self) -> Iterator["RelationView"]:
+        return (RelationView(self, row) for row in range(len(self.ids)))
+
+
+class PropertiesView(Mapping):
+    """
+    the properties of a row, read from the columns of its table
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: Table, row: int) -> None:
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, property: str) -> str:
+        return self.table.value(self.row, property)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table.properties)
+
+    def __len__(self) -> int:
+        return len(self.table.properties)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class NodeView(Node):
+    """
+    A row of a Table as a record.Node
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: Table, row: int) -> None:
+        self.table = table
+        self.row = row
+
+    @property
+    def label(self) -> str:
+        return self.table.label
+
+    @property
+    def id(self) -> int:
+        return self.table.ids[self.row]
+
+    @property
+    def properties(self) -> PropertiesView:
+        return PropertiesView(self.table, self.row)
+
+
+class RelationView(Relation):
+    """
+    A row of a RelationTable as a record.Relation
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: RelationTable, row: int) -> None:
+        self.table = table
+        self.row = row
+
+    @property
+    def label(self) -> str:
+        return self.table.label
+
+    @property
+    def id(self) -> int:
+        return self.table.ids[self.row]
+
+    @property
+    def src_node(self) -> NodeView:
+        return NodeView(self.table.src_table, self.table.src_rows[self.row])
+
+    @property
+    def dst_node(self) -> NodeView:
+        return NodeView(self.table.dst_table, self.table.dst_rows[self.row])
+
+    @property
+    def properties(self) -> PropertiesView:
+        return PropertiesView(self.table, self.row)
@@ -0,0 +1,131 @@
+from typing import List, Optional, Tuple, Union
+import sqlite3
+import threading
+
+from example_parser import Example, examples_fingerprint
+
+class VerdictCache:
+    """
+    A persistent cache of candidate verdicts in a SQLite file
+
+    Key: (fingerprint of the example graph, fingerprint of the output, canonical Cypher text)
+    Value: verdict, and number of rows of the result (NULL if unknown)
+
+    The examples of the key are the ones of the Synthesizer using the cache (see use()),
+    so a cache is never asked about candidates of other examples.
+
+    Eviction: at most ```max_entries``` verdicts are kept,
+    the least recently used ones are deleted first.
+
+    Invalidation: the graph fingerprint of each example directory is remembered,
+    once the graph in that directory changes, all verdicts of its old graph are deleted.
+
+    With several examples, a verdict is on all of them (a candidate is valid if it passes every example),
+    it is keyed by the fingerprints of all graphs and outputs, and never invalidated (the key changes instead).
+    """
+    graph_fingerprint: Optional[str]
+    output_fingerprint: Optional[str]
+    max_entries: int
+
+    def __init__(self, path: str, max_entries: int = 1000000) -> None:
+        self.graph_fingerprint = self.output_fingerprint = None  # set by use()
+        self.max_entries = max_entries
+
+        # used by the worker threads of a parallel search
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._clock = 0  # last used time of entries
+        self._num_entries = 0
+
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                                     "graph TEXT, output TEXT, query TEXT, verdict INTEGER, row_count INTEGER, "
+                                     "last_used INTEGER, PRIMARY KEY (graph, output, query))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts (last_used)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS examples (path TEXT PRIMARY KEY, graph TEXT)")
+
+            self._clock, self._num_entries = self._connection.execute(
+                "SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM verdicts").fetchone()
+
+    def use(self, example: Union[Example, List[Example]]) -> None:
+        """
+        Key the verdicts by ```example``` (an example or a list of examples) from now on,
+        called by the Synthesizer with its own examples
+        """
+        examples = example if isinstance(example, list) else [example]
+        with self._lock, self._connection:
+            if len(examples) == 1:
+                self.graph_fingerprint = examples[0].graph_fingerprint()
+                self.output_fingerprint = examples[0].output_fingerprint()
+                self._invalidate(examples[0].path)
+                self._num_entries = self._connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            else:
+                self.graph_fingerprint = self.output_fingerprint = examples_fingerprint(examples)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def get(self, query: str) -> Optional[Tuple[bool, Optional[int]]]:
+        """
+        Return (verdict, row_count) of the canonical Cypher ```query```, or None if unknown
+        """
+        self._check_used()
+        with self._lock:
+            key = (self.graph_fingerprint, self.output_fingerprint, query)
+            row = self._connection.execute("SELECT verdict, row_count FROM verdicts "
+                                           "WHERE graph = ? AND output = ? AND query = ?", key).fetchone()
+            if row is None:
+                return None
+
+            self._clock += 1
+            self._connection.execute("UPDATE verdicts SET last_used = ? "
+                                     "WHERE graph = ? AND output = ? AND query = ?", (self._clock,) + key)
+            return bool(row[0]), row[1]
+
+    def put(self, query: str, verdict: bool, row_count: Optional[int] = None) -> None:
+        """
+        Remember the verdict of the canonical Cypher ```query```
+        """
+        self._check_used()
+        with self._lock:
+            self._clock += 1
+            cursor = self._connection.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                (self.graph_fingerprint, self.output_fingerprint, query, int(verdict), row_count, self._clock))
+            self._num_entries += cursor.rowcount
+
+            if self._num_entries > self.max_entries:
+                self._evict()
+
+    def commit(self) -> None:
+        """
+        write pending verdicts to the file
+        """
+        with self._lock:
+            self._connection.commit()
+
+    def _check_used(self) -> None:
+        if self.graph_fingerprint is None:
+            raise RuntimeError("VerdictCache.use() is not called, the examples of the verdicts are unknown")
+
+    def _evict(self) -> None:
+        """
+        delete the least recently used tenth of the entries
+        """
+        num_to_delete = self._num_entries - self.max_entries * 9 // 10
+        self._connection.execute("DELETE FROM verdicts WHERE rowid IN "
+                                 "(SELECT rowid FROM verdicts ORDER BY last_used LIMIT ?)", (num_to_delete,))
+        self._num_entries = self._connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def _invalidate(self, example_path: str) -> None:
+        """
+        delete verdicts of the old graph if the graph of ```example_path``` is changed
+        """
+        row = self._connection.execute("SELECT graph FROM examples WHERE path = ?", (example_path,)).fetchone()
+        if row is not None and row[0] != self.graph_fingerprint:
+            self._connection.execute("DELETE FROM verdicts WHERE graph = ?", (row[0],))
+
+        self._connection.execute("INSERT OR REPLACE INTO examples VALUES (?, ?)",
+                                 (example_path, self.graph_fingerprint))
@@ -0,0 +1,157 @@
+from typing import List, Dict
+from pathlib import Path
+import argparse
+import random
+import json
+import csv
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "AutoCypher"))
+
+from example_parser import Example
+from evaluator import InMemoryEvaluator
+import dsl
+
+# parameters of each case of a suite
+SUITES = {
+    "small": [
+        {"num_labels": 2, "num_nodes": 20, "num_relations": 30, "num_properties": 2, "num_values": 5,
+         "num_constants": 2, "target_size": 3},
+        {"num_labels": 2, "num_nodes": 50, "num_relations": 80, "num_properties": 3, "num_values": 8,
+         "num_constants": 3, "target_size": 4},
+        {"num_labels": 3, "num_nodes": 30, "num_relations": 40, "num_properties": 2, "num_values": 8,
+         "num_constants": 3, "target_size": 4},
+    ],
+    "scale": [
+        {"num_labels": 3, "num_nodes": num_nodes, "num_relations": 2 * num_nodes, "num_properties": 3,
+         "num_values": 20, "num_constants": 4, "target_size": 4}
+        for num_nodes in [100, 1000, 10000, 100000]
+    ],
+    "query": [
+        {"num_labels": 4, "num_nodes": 200, "num_relations": 400, "num_properties": 3, "num_values": 10,
+         "num_constants": 6, "target_size": target_size}
+        for target_size in [2, 3, 4, 5, 6]
+    ],
+}
+
+def generate(path: str, num_labels: int = 2, num_nodes: int = 100, num_relations: int = 200,
+             num_properties: int = 3, num_values: int = 10, num_constants: int = 3, target_size: int = 3,
+             seed: int = 0) -> str:
+    """
+    Write a random example to directory ```path``` in the format of example_parser.Example,
+    and return the Cypher of its hidden target query.
+
+    Node labels L0, L1 ... each have ```num_nodes``` nodes with properties p0, p1 ...
+    whose values are drawn from ```num_values``` strings shared by all columns.
+    Relation label R{i} goes from L{i} to L{i+1} and has ```num_relations``` relations.
+
+    The target program has ```target_size``` statements:
+    Match statements along the chain of labels, then Require statements
+    on constants taken from its rows (so the output is never empty), then Return.
+    The output is the result of the target on the generated graph,
+    and the constants are the ones of the target plus random decoys.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for f in path.glob("*.csv"):
+        f.unlink()  # files of a previous run
+
+    labels = [f"L{i}" for i in range(num_labels)]
+    properties = [f"p{i}" for i in range(num_properties)]
+    values = [f"v{i}" for i in range(num_values)]
+
+    for label in labels:
+        rows = [[node_id] + [rng.choice(values) for _ in properties] for node_id in range(num_nodes)]
+        rng.shuffle(rows)  # ids are not the row order
+        _write(path / f"node_{label}.csv", [["node", label], ["id"] + properties] + rows)
+
+    for i in range(num_labels - 1):
+        rows = [[rel_id, rng.randrange(num_nodes), rng.randrange(num_nodes), rng.choice(values)]
+                for rel_id in range(num_relations)]
+        _write(path / f"rel_R{i}.csv", [["rel", f"R{i}"], ["id", labels[i], labels[i + 1], "since"]] + rows)
+
+    # the graph without output and constants
+    example = Example(str(path))
+    evaluator = InMemoryEvaluator(example)
+    program = _target_program(example, evaluator, labels, properties, target_size, rng)
+
+    result = evaluator.evaluate(program)
+    output_keys = list(program[-1].properties)
+    _write(path / "output.csv", [["output"], output_keys] + [list(row) for row in result])
+
+    constants = [statement.condition.constant for statement in program if isinstance(statement, dsl.Require)]
+    while len(set(constants)) < min(num_constants, num_values):
+        constants.append(rng.choice(values))
+    constants = list(dict.fromkeys(constants))
+    rng.shuffle(constants)
+    _write(path / "constant.csv", [["constant"]] + [[constant] for constant in constants])
+
+    return dsl.translate(program)
+
+
+def _target_program(example: Example, evaluator: InMemoryEvaluator, labels: List[str], properties: List[str],
+                    target_size: int, rng: random.Random) -> List[dsl.DSL]:
+    """
+    A random program with ```target_size``` statements (at least a Match and the Return)
+    """
+    num_statements = max(target_size, 2) - 1  # without Return
+    num_matches = min((num_statements + 1) // 2, max(len(labels) - 1, 1))
+
+    program = []
+    nodes = [dsl.Node(labels[0], "n0")]
+    if len(labels) == 1:
+        program.append(dsl.Match(nodes[0]))
+    else:
+        for i in range(num_matches):
+            nodes.append(dsl.Node(labels[i + 1], f"n{i + 1}"))
+            program.append(dsl.Match(nodes[i], dsl.Relation(f"R{i}", f"r{i}"), nodes[i + 1]))
+
+    for _ in range(num_statements - len(program)):
+        bindings = evaluator.bindings(program)
+        if not bindings:
+            break
+
+        # a condition true on some current row
+        binding = rng.randrange(len(bindings))
+        node = rng.choice(nodes)
+        property = rng.choice(properties)
+        constant = example.nodes[node.label].value(bindings.column(node.variable)[binding], property)
+        program.append(dsl.Require(dsl.EqualTo(property, node.variable, constant)))
+
+    first, last = nodes[0], nodes[-1]
+    program.append(dsl.Return([properties[0], properties[-1]], [first.variable, last.variable]))
+    return program
+
+
+def generate_suite(path: str, suite: str, seed: int = 0) -> Dict[str, Dict]:
+    """
+    Generate every case of ```suite``` under ```path``` (one directory per case),
+    and write the parameters and the target query of each case to ```path```/suite.json
+    """
+    path = Path(path)
+    cases = {}
+    for i, parameters in enumerate(SUITES[suite]):
+        name = f"{suite}_{i}"
+        target = generate(str(path / name), **parameters, seed=seed + i)
+        cases[name] = {"parameters": parameters, "seed": seed + i, "target": target}
+        print(f"{name}: {parameters}")
+
+    with (path / "suite.json").open("w") as f:
+        json.dump(cases, f, indent=2)
+    return cases
+
+
+def _write(path: Path, rows: List[list]) -> None:
+    with path.open("w", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic examples to benchmark the synthesizer")
+    parser.add_argument("path", help="directory to write the examples to")
+    parser.add_argument("--suite", default="small", choices=sorted(SUITES), help="cases to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_suite(args.path, args.suite, args.seed)
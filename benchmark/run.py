@@ -0,0 +1,194 @@
+from typing import List, Dict, Tuple
+from pathlib import Path
+import tracemalloc
+import argparse
+import platform
+import time
+import json
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "AutoCypher"))
+
+from example_parser import Example
+from database import CypherDatabase
+from evaluator import CypherEvaluator, MODE_FETCH, MODE_VERIFY, MODE_STREAM
+from budget import Budget, SynthesisNotFound, REASON_SIZE_LIMIT
+from metrics import Metrics, NULL_METRICS, DATABASE_QUERIES
+from synthesizer import Synthesizer, MAX_SKETCH_SIZE
+
+BACKEND_MEMORY = "memory"  # InMemoryEvaluator
+BACKEND_NEO4J = "neo4j"  # CypherEvaluator on a local neo4j database
+
+# metrics compared with a baseline, and the relative increase tolerated
+TOLERANCES = {"num_candidates": 0.0, "num_queries": 0.0, "seconds": 0.5, "peak_memory_mb": 0.2}
+
+def run_case(path: str, backend: str = BACKEND_MEMORY, database: CypherDatabase = None, mode: str = MODE_FETCH,
+             workers: int = 1, max_sketch_size: int = MAX_SKETCH_SIZE, budget: Budget = None) -> Dict:
+    """
+    Synthesize the example in ```path``` and return the metrics of the search:
+    wall time of the search (the parse and the database load are timed apart), candidates evaluated,
+    Cypher queries sent to neo4j (none on the memory backend), and the peak memory traced by tracemalloc.
+
+    Tracing slows the search down several times, so the peak memory is measured on a second, traced run
+    of the same search (limited to the queries of the first one if it stopped on its budget).
+    """
+    metrics = Metrics()
+    start = time.perf_counter()
+    example = Example(path)
+    parse_seconds = time.perf_counter() - start
+
+    load_seconds = 0.0
+    if backend == BACKEND_NEO4J:
+        database.clear_all()
+        _, load_seconds = database.create_database_from_example(example)
+
+    synthesizer, query, reason, search_seconds = _synthesize(example, backend, database, mode, workers,
+                                                             max_sketch_size, budget, metrics)
+
+    traced_budget = None if reason in (None, REASON_SIZE_LIMIT) else Budget(queries=synthesizer.num_queries)
+    tracemalloc.start()
+    try:
+        _synthesize(Example(path), backend, database, mode, workers, max_sketch_size, traced_budget, Metrics())
+        peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "found": query is not None,
+        "reason": reason,
+        "query": query,
+        "seconds": search_seconds,
+        "parse_seconds": parse_seconds,
+        "load_seconds": load_seconds,
+        "num_sketches": synthesizer.num_sketches,
+        "num_candidates": synthesizer.num_candidates,
+        "num_queries": metrics.snapshot()["counters"].get(DATABASE_QUERIES, 0),
+        "peak_memory_mb": peak_memory_mb,
+    }
+
+
+def _synthesize(example: Example, backend: str, database: CypherDatabase, mode: str, workers: int,
+                max_sketch_size: int, budget: Budget, metrics: Metrics) -> Tuple[Synthesizer, str, str, float]:
+    """
+    run the search, recording the queries sent to ```database``` to ```metrics```,
+    return the synthesizer, the query found (or None and the reason), and the seconds of the search
+    """
+    evaluator = None
+    if backend == BACKEND_NEO4J:
+        database.metrics = metrics
+        evaluator = CypherEvaluator(database, mode=mode)
+
+    synthesizer = Synthesizer(example, evaluator=evaluator, workers=workers, metrics=metrics)
+    start = time.perf_counter()
+    try:
+        query = synthesizer.synthesize(max_sketch_size, budget)
+        reason = None
+    except SynthesisNotFound as e:
+        query = None
+        reason = e.reason
+    finally:
+        if database is not None:
+            database.metrics = NULL_METRICS
+    return synthesizer, query, reason, time.perf_counter() - start
+
+
+def run_suite(path: str, cases: List[str] = None, **options) -> Dict[str, Dict]:
+    """
+    run_case on each case of the suite generated in ```path``` (see generate.py), or only on ```cases```
+    """
+    with (Path(path) / "suite.json").open() as f:
+        suite = json.load(f)
+
+    results = {}
+    for name in cases or suite:
+        results[name] = run_case(str(Path(path) / name), **options)
+        result = results[name]
+        print(f"{name}: found={result['found']} {result['seconds']:.2f}s "
+              f"(parse {result['parse_seconds']:.2f}s, load {result['load_seconds']:.2f}s) "
+              f"{result['num_candidates']} candidates {result['num_queries']} queries "
+              f"{result['peak_memory_mb']:.1f}MB")
+    return results
+
+
+def save_baseline(path: str, results: Dict[str, Dict], options: Dict) -> None:
+    baseline = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "options": options,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare_baseline(path: str, results: Dict[str, Dict]) -> List[str]:
+    """
+    Regressions of ```results``` against the baseline in ```path```:
+    a case no longer found, or a metric above the baseline by more than its tolerance (see TOLERANCES).
+    Candidates and queries are deterministic, so any increase is a regression.
+    """
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue  # a new case
+
+        if expected["found"] and not result["found"]:
+            regressions.append(f"{name}: not found ({result['reason']})")
+            continue
+
+        for metric, tolerance in TOLERANCES.items():
+            if result[metric] > expected[metric] * (1 + tolerance) + _noise(metric):
+                regressions.append(f"{name}: {metric} {expected[metric]:.3f} -> {result[metric]:.3f}")
+
+    return regressions
+
+
+def _noise(metric: str) -> float:
+    """
+    absolute slack of a metric, so tiny cases are not flagged by timer noise
+    """
+    return {"seconds": 0.05, "peak_memory_mb": 1.0}.get(metric, 0.0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the synthesizer on a generated suite (see generate.py)")
+    parser.add_argument("path", help="directory of the generated suite")
+    parser.add_argument("--case", action="append", help="only run this case (could be repeated)")
+    parser.add_argument("--backend", default=BACKEND_MEMORY, choices=[BACKEND_MEMORY, BACKEND_NEO4J])
+    parser.add_argument("--mode", default=MODE_FETCH, choices=[MODE_FETCH, MODE_VERIFY, MODE_STREAM],
+                        help="how the neo4j backend checks candidates")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="threads validating candidates (only used by the neo4j backend, "
+                             "the memory backend always runs on one)")
+    parser.add_argument("--max-sketch-size", type=int, default=MAX_SKETCH_SIZE)
+    parser.add_argument("--time-limit", type=float, help="wall-clock budget of each search in seconds")
+    parser.add_argument("--save", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare the results with a baseline JSON file, exit 1 on regressions")
+    args = parser.parse_args()
+
+    database = None
+    if args.backend == BACKEND_NEO4J:
+        database = CypherDatabase("bolt://localhost:7687", "neo4j", "password")
+
+    options = {"backend": args.backend, "mode": args.mode, "workers": args.workers,
+               "max_sketch_size": args.max_sketch_size}
+    results = run_suite(args.path, args.case, database=database, budget=Budget(args.time_limit), **options)
+
+    if database is not None:
+        database.close()
+
+    if args.save:
+        save_baseline(args.save, results, options)
+
+    if args.compare:
+        regressions = compare_baseline(args.compare, results)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            exit(1)
+        print("no regression")
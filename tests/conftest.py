@@ -0,0 +1,107 @@
+from typing import List, Dict
+from pathlib import Path
+import shutil
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "AutoCypher"))
+sys.path.insert(0, str(ROOT / "benchmark"))
+
+from example_parser import Example
+import database
+from generate import generate, SUITES
+
+EXAMPLE_DIR = ROOT / "example"
+
+@pytest.fixture
+def make_example(tmp_path):
+    """
+    Factory of examples written under tmp_path:
+    make_example(files) writes each file name -> content of ```files```,
+    with ```base```, a directory of example/ is copied first (and ```files``` replace some of its files),
+    with ```generated```, the case of that index of the small benchmark suite is generated first (see generate.py).
+    Examples of a test need different ```name```s.
+    """
+    def make(files: Dict[str, str] = None, base: str = None, generated: int = None,
+             name: str = "example") -> Example:
+        path = tmp_path / name
+        if base is not None:
+            shutil.copytree(EXAMPLE_DIR / base, path)
+        if generated is not None:
+            generate(str(path), **SUITES["small"][generated], seed=generated)
+        path.mkdir(exist_ok=True)
+        for file_name, content in (files or {}).items():
+            (path / file_name).write_text(content)
+        return Example(str(path))
+
+    return make
+
+
+class FakeResult:
+    """
+    records of a query, counting how many of them are fetched
+    """
+    def __init__(self, records: List[Dict]) -> None:
+        self.records = records
+        self.fetched = 0
+
+    def __iter__(self):
+        for record in self.records:
+            self.fetched += 1
+            yield record
+
+    def consume(self) -> None:
+        pass
+
+
+class FakeSession:
+    """
+    a neo4j session running every transaction on the same recording transaction
+    """
+    def __init__(self, results: List[List[Dict]]) -> None:
+        self.results = results  # records of each query, in the order they are run
+        self.runs = []  # (query, parameters) of each query
+        self.fetched = []  # FakeResult of each query
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query: str, parameters: Dict = None, **kwargs) -> FakeResult:
+        self.runs.append((query, parameters if parameters is not None else kwargs))
+        result = FakeResult(self.results.pop(0) if self.results else [])
+        self.fetched.append(result)
+        return result
+
+    def execute_read(self, work, *args):
+        return work(self, *args)
+
+    def execute_write(self, work, *args):
+        return work(self, *args)
+
+
+@pytest.fixture
+def fake_database(monkeypatch):
+    """
+    Factory of a CypherDatabase on a fake driver:
+    fake_database(results) returns the database and the FakeSession of all its queries,
+    the n-th query run returns the records (dicts) ```results[n]```
+    """
+    def make(results: List[List[Dict]] = None):
+        session = FakeSession(list(results or []))
+
+        class FakeDriver:
+            def session(self, **config):
+                return session
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(database.GraphDatabase, "driver", lambda *args, **kwargs: FakeDriver())
+        return database.CypherDatabase("bolt://localhost:7687", "neo4j", "password"), session
+
+    return make
@@ -0,0 +1,26 @@
+import tracemalloc
+
+from run import run_case
+from budget import Budget, REASON_QUERIES
+from synthesizer import Synthesizer
+
+
+def test_run_case(make_example):
+    example = make_example(generated=1)
+    synthesizer = Synthesizer(example)
+    query = synthesizer.synthesize(4)
+
+    result = run_case(example.path, max_sketch_size=4)
+    assert (result["found"], result["query"]) == (True, query)
+    assert result["num_candidates"] == synthesizer.num_candidates
+    assert result["num_queries"] == 0  # no database on the memory backend
+    assert result["parse_seconds"] > 0 and result["load_seconds"] == 0
+    assert result["peak_memory_mb"] > 0
+    assert not tracemalloc.is_tracing()
+
+def test_run_case_on_budget(make_example):
+    example = make_example(generated=1)
+
+    result = run_case(example.path, max_sketch_size=4, budget=Budget(queries=5))
+    assert (result["found"], result["reason"]) == (False, REASON_QUERIES)
+    assert result["peak_memory_mb"] > 0
@@ -0,0 +1,28 @@
+import pytest
+
+from synthesizer import Synthesizer
+from budget import Budget, SynthesisNotFound, REASON_QUERIES
+from checkpoint import Checkpoint
+
+
+@pytest.mark.parametrize("queries", [3, 10])
+def test_resumed_search_matches_uninterrupted(make_example, tmp_path, queries):
+    example = make_example(generated=1)
+    uninterrupted = Synthesizer(example)
+    query = uninterrupted.synthesize(4)
+
+    checkpoint = Checkpoint(tmp_path / "search.ckpt")
+    for num_runs in range(1, 1000):
+        synthesizer = Synthesizer(example)
+        try:
+            resumed_query = synthesizer.synthesize(4, Budget(queries=queries), checkpoint)
+            break
+        except SynthesisNotFound as e:
+            assert e.reason == REASON_QUERIES
+            assert checkpoint.path.exists()
+
+    assert num_runs > 1
+    assert resumed_query == query
+    assert synthesizer.num_candidates == uninterrupted.num_candidates
+    assert synthesizer.num_sketches == uninterrupted.num_sketches
+    assert not checkpoint.path.exists()
@@ -0,0 +1,67 @@
+from evaluator import CypherEvaluator, MODE_VERIFY
+import dsl
+
+
+def program(constant: str) -> list:
+    return [dsl.Match(dsl.Node("Company", "c")), dsl.Require(dsl.EqualTo("location", "c", constant)),
+            dsl.Return(["company_name"], ["c"])]
+
+
+def test_query_batch_is_one_query(fake_database):
+    database, session = fake_database([[{"query": 2, "row": ["Google"]}, {"query": 0, "row": ["Amazon"]},
+                                        {"query": 2, "row": ["Amazon"]}]])
+
+    rows = database.query_batch(*dsl.translate_batch([program("US"), program("UK"), program("JP")]), 3)
+
+    assert rows == [[("Amazon",)], [], [("Google",), ("Amazon",)]]
+    assert len(session.runs) == 1
+
+def test_check_batch_is_one_round_trip(fake_database):
+    database, session = fake_database([[{"query": 0, "row": ["Amazon"]}, {"query": 1, "row": ["Google"]}]])
+    evaluator = CypherEvaluator(database, batch_size=2)
+
+    assert evaluator.check_batch([program("US"), program("UK")], [("Google",)]) == [(False, 1), (True, 1)]
+    query, parameters = session.runs[0]
+    assert len(session.runs) == 1
+    assert query.startswith("CALL {") and query.count("UNION ALL") == 1
+    assert parameters == {"c0": "US", "c1": "UK"}
+
+def test_verify_batch_is_one_round_trip(fake_database):
+    database, session = fake_database([[{"query": 1, "verdict": True}, {"query": 0, "verdict": False}]])
+    evaluator = CypherEvaluator(database, batch_size=2, mode=MODE_VERIFY)
+
+    assert evaluator.check_batch([program("US"), program("UK")], [("Google",)]) == [(False, None), (True, None)]
+    assert len(session.runs) == 1
+
+def test_expected_rows_are_grouped(fake_database):
+    database, session = fake_database([[{"verdict": True}]])
+
+    assert database.verify("<query>", [("Ann", "A"), ("Bob", "B"), ("Ann", "A")], {"c0": "x"})
+    assert session.runs == [("<query>", {"c0": "x", "expected": [[["Ann", "A"], 2], [["Bob", "B"], 1]],
+                                         "limit": 4})]
+
+def test_streaming_stops_at_the_first_unexpected_row(fake_database):
+    database, session = fake_database([[{"name": "Ann"}, {"name": "Eve"}, {"name": "Bob"}]])
+
+    assert not database.query_streaming("<query>", [("Ann",), ("Bob",)])
+    assert session.fetched[0].fetched == 2
+
+def test_streaming_compares_multisets(fake_database):
+    database, _ = fake_database([[{"name": "Ann"}, {"name": "Bob"}, {"name": "Ann"}],
+                                 [{"name": "Ann"}, {"name": "Bob"}],
+                                 [{"name": "Ann"}, {"name": "Bob"}, {"name": "Ann"}, {"name": "Ann"}]])
+    expected = [("Ann",), ("Ann",), ("Bob",)]
+
+    assert database.query_streaming_batch(["<q0>", "<q1>", "<q2>"], expected) == [True, False, False]
+
+def test_bulk_load_in_batches(fake_database, make_example):
+    database, session = fake_database()
+    example = make_example(base="example1")
+
+    num_rows, _ = database.create_database_from_example(example, batch_size=4)
+
+    assert num_rows == 6 + 8 + 5
+    creates = [parameters["rows"] for query, parameters in session.runs if query.startswith("UNWIND")]
+    assert [len(rows) for rows in creates] == [4, 2, 4, 4, 4, 1]  # Company, Person, WORKS_FOR
+    assert creates[0][0] == {"id": 0, "properties": {"company_name": "Google", "location": "UK"}}
+    assert creates[-1][0] == {"src": 6, "dst": 4, "properties": {}}
@@ -0,0 +1,72 @@
+from record import quote, Node
+import dsl
+
+
+def program(constant: str) -> list:
+    return [dsl.Match(dsl.Node("Company", "c")), dsl.Require(dsl.EqualTo("location", "c", constant)),
+            dsl.Return(["company_name"], ["c"])]
+
+
+def test_translate_batch():
+    query, parameters = dsl.translate_batch([program("US"), program("UK")])
+
+    assert query == ("CALL {\n"
+                     "MATCH (c:Company)\nWITH *\nWHERE c.location = $c0\n"
+                     "WITH *\nWHERE c.company_name IS NOT NULL\nRETURN 0 AS query, [c.company_name] AS row\n"
+                     "UNION ALL\n"
+                     "MATCH (c:Company)\nWITH *\nWHERE c.location = $c1\n"
+                     "WITH *\nWHERE c.company_name IS NOT NULL\nRETURN 1 AS query, [c.company_name] AS row\n"
+                     "}\n"
+                     "RETURN query, row")
+    assert parameters == {"c0": "US", "c1": "UK"}
+
+def test_translate_batch_verification():
+    query, _ = dsl.translate_batch([program("US"), program("UK")], verification=True)
+
+    assert query.count("AS verdict") == 2
+    assert "RETURN 0 AS query, " in query and "RETURN 1 AS query, " in query
+    assert query.endswith("}\nRETURN query, verdict")
+
+def test_constants_are_parameters():
+    us, us_parameters = dsl.translate_with_parameters(program("US"))
+    uk, uk_parameters = dsl.translate_with_parameters(program("UK"))
+
+    assert us == uk  # the same query plan
+    assert us_parameters == {"c0": "US"} and uk_parameters == {"c0": "UK"}
+    assert "$c0" in us and "US" not in us
+
+def test_constants_are_quoted_inline():
+    assert dsl.translate(program(r'say "hi" \o/')).split("\n")[2] == r'WHERE c.location = "say \"hi\" \\o/"'
+
+def test_quote():
+    assert quote("US") == '"US"'
+    assert quote('a"b') == r'"a\"b"'
+    assert quote(r"a\b") == r'"a\\b"'
+    assert quote(r'\"') == r'"\\\""'
+
+def test_record_properties_are_parameters():
+    node = Node("Person", 1)
+    node.properties = {"name": 'Ann "A"', "city": "A"}
+
+    assert node.str_with_parameter("n", "properties") == "(n:Person {name: $properties.name, city: $properties.city})"
+    assert str(node) == r'(:Person {name: "Ann \"A\"", city: "A"})'
+
+
+VERIFICATION_TAIL = ("LIMIT $limit\n"
+                     "WITH row, count(*) AS count\n"
+                     "WITH collect([row, count]) AS rows\n"
+                     "UNWIND rows + [e IN $expected | [e[0], -e[1]]] AS r\n"
+                     "WITH r[0] AS row, sum(r[1]) AS difference\n"
+                     "RETURN all(d IN collect(difference) WHERE d = 0) AS verdict")
+
+def test_verification_without_column():
+    assert dsl.Return([], []).to_verification_Cypher() == "WITH *\nWITH [] AS row\n" + VERIFICATION_TAIL
+
+def test_verification_with_one_column():
+    assert dsl.Return(["name"], ["n"]).to_verification_Cypher() == (
+        "WITH *\nWHERE n.name IS NOT NULL\nWITH [n.name] AS row\n" + VERIFICATION_TAIL)
+
+def test_verification_with_several_columns():
+    assert dsl.Return(["name", "city", "name"], ["n", "m", "m"]).to_verification_Cypher() == (
+        "WITH *\nWHERE n.name IS NOT NULL AND m.city IS NOT NULL AND m.name IS NOT NULL\n"
+        "WITH [n.name, m.city, m.name] AS row\n" + VERIFICATION_TAIL)
@@ -0,0 +1,24 @@
+import pytest
+
+from synthesizer import Synthesizer, _sketch_name
+
+
+@pytest.mark.parametrize("undirected_relations", [False, True])
+@pytest.mark.parametrize("example", [{"base": "example1"}, {"base": "example2"}, {"generated": 0}, {"generated": 1}])
+def test_count_is_the_enumeration(make_example, example, undirected_relations):
+    synthesizer = Synthesizer(make_example(**example), undirected_relations=undirected_relations)
+    synthesizer._prepare_search()
+    synthesizer.pruner = None  # the estimator does not count equivalent programs out
+
+    for sketch in synthesizer._sketches(4):
+        assert synthesizer.estimator.count(sketch) == sum(1 for _ in synthesizer._complete_sketch(sketch))
+
+def test_dry_run_estimates_each_sketch(make_example, capsys):
+    synthesizer = Synthesizer(make_example(base="example2"))
+    rows = synthesizer.dry_run(4, num_samples=5)
+
+    assert [row["sketch"] for row in rows] == [_sketch_name(sketch) for sketch in synthesizer._sketches(4)]
+    for row in rows:
+        assert row["seconds"] == row["completion_seconds"] + row["query_seconds"]
+    assert any(row["completion_seconds"] > 0 and row["query_seconds"] > 0 for row in rows)
+    assert "estimated total" in capsys.readouterr().out
@@ -0,0 +1,93 @@
+import pytest
+
+from example_parser import Example
+from evaluator import InMemoryEvaluator
+import dsl
+
+
+def works_for(directed: bool = True) -> dsl.Match:
+    return dsl.Match(dsl.Node("Person", "p"), dsl.Relation("WORKS_FOR", "r", directed), dsl.Node("Company", "c"))
+
+def knows(node2: str, directed: bool = True) -> dsl.Match:
+    return dsl.Match(dsl.Node("Person", "n"), dsl.Relation("KNOWS", "k", directed), dsl.Node("Person", node2))
+
+def equal_to(property: str, variable: str, constant: str) -> dsl.Require:
+    return dsl.Require(dsl.EqualTo(property, variable, constant))
+
+def evaluate(example: Example, program: list) -> list:
+    return sorted(InMemoryEvaluator(example).evaluate(program))
+
+
+@pytest.fixture
+def self_loop_example(make_example):
+    """
+    Ann -> Bob, Ann -> Cat, Cat -> Ann, and self loops on Bob and Dan
+    """
+    return make_example({
+        "node_person.csv": "node,Person\nid,name,city\n1,Ann,A\n2,Bob,B\n3,Cat,A\n4,Dan,C",
+        "rel_knows.csv": "rel,KNOWS\nid,Person,Person,since\n1,1,2,x\n2,2,2,y\n3,3,1,x\n4,4,4,y\n5,1,3,z",
+        "constant.csv": "constant\nx\nA\n",
+        "output.csv": "output\nname,city\nAnn,A\nBob,B",
+    })
+
+
+def test_example1_rows(make_example):
+    example = make_example(base="example1")
+    returned = dsl.Return(["person_name", "company_name"], ["p", "c"])
+
+    assert evaluate(example, [works_for(), returned]) == [
+        ("Alice", "UTAustin"), ("George", "Google"), ("Jie", "Amazon"), ("Mike", "Amazon"), ("Misaki", "Amazon"),
+    ]
+    assert evaluate(example, [works_for(), equal_to("location", "c", "US"), returned]) == sorted(
+        tuple(record.values) for record in example.output)
+
+def test_example2_rows(make_example):
+    example = make_example(base="example2")
+    returned = dsl.Return(["person_name", "company_name"], ["p", "c"])
+
+    assert evaluate(example, [works_for(), equal_to("company_name", "c", "Amazon"), returned]) == [
+        ("Jie", "Amazon"), ("Mike", "Amazon"), ("Misaki", "Amazon"),
+    ]
+    assert evaluate(example, [works_for(), equal_to("company_name", "c", "Amazon"),
+                              equal_to("location", "c", "US"), returned]) == sorted(
+        tuple(record.values) for record in example.output)
+
+def test_single_node_rows(make_example):
+    example = make_example(base="example1")
+    program = [dsl.Match(dsl.Node("Company", "c")), equal_to("location", "c", "US"),
+               dsl.Return(["company_name"], ["c"])]
+
+    assert evaluate(example, program) == [("Amazon",), ("Google",), ("UTAustin",)]
+
+def test_undirected_rows(make_example):
+    example = make_example(base="example1")
+    returned = dsl.Return(["person_name", "company_name"], ["p", "c"])
+
+    assert evaluate(example, [works_for(False), returned]) == evaluate(example, [works_for(), returned])
+
+def test_self_loop_rows(self_loop_example):
+    returned = dsl.Return(["name"], ["n"])
+
+    assert evaluate(self_loop_example, [knows("n"), returned]) == [("Bob",), ("Dan",)]
+    assert evaluate(self_loop_example, [knows("n", False), returned]) == [("Bob",), ("Dan",)]
+
+def test_relation_rows_with_self_loops(self_loop_example):
+    returned = dsl.Return(["name", "name"], ["n", "m"])
+
+    assert evaluate(self_loop_example, [knows("m"), returned]) == [
+        ("Ann", "Bob"), ("Ann", "Cat"), ("Bob", "Bob"), ("Cat", "Ann"), ("Dan", "Dan"),
+    ]
+    # a self loop is matched once in either direction, Ann and Cat know each other both ways
+    assert evaluate(self_loop_example, [knows("m", False), returned]) == [
+        ("Ann", "Bob"), ("Ann", "Cat"), ("Ann", "Cat"), ("Bob", "Ann"), ("Bob", "Bob"),
+        ("Cat", "Ann"), ("Cat", "Ann"), ("Dan", "Dan"),
+    ]
+
+def test_join_on_shared_variable(self_loop_example):
+    program = [knows("m"), dsl.Match(dsl.Node("Person", "m"), dsl.Relation("KNOWS", "k2"), dsl.Node("Person", "o")),
+               dsl.Return(["name", "name", "name"], ["n", "m", "o"])]
+
+    assert evaluate(self_loop_example, program) == [
+        ("Ann", "Bob", "Bob"), ("Ann", "Cat", "Ann"), ("Bob", "Bob", "Bob"),
+        ("Cat", "Ann", "Bob"), ("Cat", "Ann", "Cat"), ("Dan", "Dan", "Dan"),
+    ]
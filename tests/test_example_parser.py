@@ -0,0 +1,36 @@
+import pytest
+
+
+PEOPLE = "node,Person\nid,name,country\n10,\"Smith, John\",US\n3,Alice,\"UK, London\"\n7,Bob,JP\n"
+
+def test_quoted_commas(make_example):
+    example = make_example({"node_person.csv": PEOPLE,
+                            "constant.csv": "constant\n\"UK, London\"\n",
+                            "output.csv": "output\nname,country\n\"Smith, John\",US\n"})
+
+    people = example.nodes["Person"]
+    assert [people.value(row, "name") for row in range(len(people))] == ["Smith, John", "Alice", "Bob"]
+    assert people.value(1, "country") == "UK, London"
+    assert example.constants == ["UK, London"]
+    assert example.constant_count("UK, London", "Person", "country") == 1
+    assert [output.values for output in example.output] == [["Smith, John", "US"]]
+
+def test_ids_differ_from_rows(make_example):
+    example = make_example({"node_person.csv": PEOPLE,
+                            "node_city.csv": "node,City\nid,city\n5,Austin\n0,Tokyo\n",
+                            "rel_lives_in.csv": "rel,LIVES_IN\nid,Person,City,since\n2,7,0,2001\n0,10,5,1999\n",
+                            "output.csv": "output\nname\nBob\n"})
+
+    # (person, city) of each relation, found by node id and not by row
+    lives_in = example.relations["LIVES_IN"]
+    assert [(relation.id, relation.src_node.properties["name"], relation.dst_node.properties["city"],
+             relation.properties["since"]) for relation in lives_in] == \
+        [(2, "Bob", "Tokyo", "2001"), (0, "Smith, John", "Austin", "1999")]
+
+@pytest.mark.parametrize("files", [
+    {"rel_knows.csv": "rel,KNOWS\nid,Person,Person\n0,10,4\n"},  # no node of id 4
+    {"node_person.csv": PEOPLE + "3,Carol,US\n"},
+])
+def test_bad_ids(make_example, files):
+    with pytest.raises(RuntimeError):
+        make_example({"node_person.csv": PEOPLE, "output.csv": "output\nname\nBob\n", **files})
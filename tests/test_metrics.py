@@ -0,0 +1,70 @@
+import io
+import json
+
+from metrics import Metrics, MemorySink, JsonLinesSink, NULL_METRICS, snapshot_delta, \
+    PHASE_COMPLETION, PHASE_QUERY, PHASE_ROUND_TRIP, CANDIDATES_GENERATED, CANDIDATES_QUERIED, DATABASE_QUERIES
+from synthesizer import Synthesizer
+
+
+def test_counters_and_timers():
+    metrics = Metrics()
+    metrics.count("a")
+    before = metrics.snapshot()
+    metrics.count("a", 2)
+    metrics.count("b")
+    metrics.observe("t", 2e-5)
+    metrics.observe("t", 20.0)
+    with metrics.timer("u"):
+        pass
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"a": 3, "b": 1}
+    assert snapshot["timers"]["t"]["count"] == 2
+    assert snapshot["timers"]["t"]["histogram"] == {"3e-05": 1, "inf": 1}
+    assert snapshot["timers"]["u"]["count"] == 1
+
+    delta = snapshot_delta(before, snapshot)
+    assert delta["counters"] == {"a": 2, "b": 1}
+    assert delta["timers"]["t"] == {"count": 2, "seconds": 2e-5 + 20.0}
+
+def test_disabled_metrics_record_nothing():
+    NULL_METRICS.count("a")
+    NULL_METRICS.observe("t", 1.0)
+    with NULL_METRICS.timer("u"):
+        pass
+    NULL_METRICS.emit("event")
+
+    assert NULL_METRICS.snapshot() == {"counters": {}, "timers": {}}
+
+def test_json_lines_sink():
+    stream = io.StringIO()
+    Metrics([JsonLinesSink(stream)]).emit("sketch", sketch="Match Return", found=False)
+
+    record = json.loads(stream.getvalue())
+    assert (record["event"], record["sketch"], record["found"]) == ("sketch", "Match Return", False)
+
+def test_search_records(make_example):
+    sink = MemorySink()
+    synthesizer = Synthesizer(make_example(generated=1), metrics=Metrics([sink]))
+    synthesizer.synthesize(4)
+
+    # a record per sketch searched, then one of the whole search
+    *sketches, search = sink.records
+    assert [record["event"] for record in sketches] == ["sketch"] * synthesizer.num_sketches
+    assert [record["found"] for record in sketches] == [False] * (len(sketches) - 1) + [True]
+    assert search["event"] == "search" and search["found"]
+
+    # the records of the sketches add up to the search
+    for counter in [CANDIDATES_GENERATED, CANDIDATES_QUERIED]:
+        assert sum(record["counters"].get(counter, 0) for record in sketches) == search["counters"][counter]
+    assert search["counters"][CANDIDATES_QUERIED] == synthesizer.num_queries
+    assert {PHASE_COMPLETION, PHASE_QUERY} <= set(search["timers"])
+
+def test_database_queries(fake_database):
+    database, _ = fake_database([[{"query": 0, "row": [1]}]])
+    database.metrics = metrics = Metrics()
+    database.query_batch("RETURN 1", {}, 2)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {DATABASE_QUERIES: 1}  # the whole batch is a single query
+    assert snapshot["timers"][PHASE_ROUND_TRIP]["count"] == 1
@@ -0,0 +1,33 @@
+import asyncio
+
+from synthesizer import Synthesizer
+from async_synthesizer import AsyncSynthesizer
+from example_order import ExampleOrder
+
+
+def test_constant_missing_from_an_example(make_example):
+    """
+    a constant of only one example is still a candidate, it matches no row of the others
+    """
+    a = make_example({"constant.csv": "constant\nUS\n"}, base="example2", name="a")
+    b = make_example({"constant.csv": "constant\nAmazon\nUS\n"}, base="example2", name="b")
+
+    expected = Synthesizer(b).synthesize()
+    assert 'node0.company_name = "Amazon"' in expected
+    assert Synthesizer([a, b]).synthesize() == expected
+    assert Synthesizer([b, a]).synthesize() == expected
+
+def test_async_search_matches_sequential(make_example):
+    a = make_example({"constant.csv": "constant\nUS\n"}, base="example2", name="a")
+    b = make_example({"constant.csv": "constant\nAmazon\nUS\n"}, base="example2", name="b")
+
+    assert asyncio.run(AsyncSynthesizer([a, b]).synthesize()) == Synthesizer([a, b]).synthesize()
+
+def test_example_order():
+    order = ExampleOrder(3)
+    order.record(0, 10, 1, 1.0)
+    order.record(1, 10, 9, 1.0)
+    assert order.order()[0] == 2  # never validated
+
+    order.record(2, 10, 10, 2.0)
+    assert order.order() == [1, 2, 0]  # most rejections per second first
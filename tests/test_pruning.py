@@ -0,0 +1,94 @@
+import pytest
+
+from evaluator import InMemoryEvaluator
+from pruning import CandidatePruner, canonical_form
+from synthesizer import Synthesizer
+import dsl
+
+
+def candidate_results(synthesizer: Synthesizer, max_sketch_size: int, prune: bool) -> set:
+    """
+    distinct results of the candidates of every sketch, generated in the search order
+    """
+    synthesizer._prepare_search()
+    if not prune:
+        synthesizer.pruner = None
+
+    evaluator = InMemoryEvaluator(synthesizer.examples[0])
+    results = set()
+    for sketch in synthesizer._sketches(max_sketch_size):
+        for program in synthesizer._candidates(sketch):
+            results.add(tuple(sorted(evaluator.evaluate(program))))
+    return results
+
+def works_for(person: str, rel: str, company: str) -> dsl.Match:
+    return dsl.Match(dsl.Node("Person", person), dsl.Relation("WORKS_FOR", rel), dsl.Node("Company", company))
+
+def equal_to(property: str, variable: str, constant: str) -> dsl.Require:
+    return dsl.Require(dsl.EqualTo(property, variable, constant))
+
+
+def test_renamed_variables_are_symmetric():
+    program = [works_for("a", "r", "b"), equal_to("location", "b", "US"), dsl.Return(["name"], ["a"])]
+    renamed = [works_for("x", "s", "y"), equal_to("location", "y", "US"), dsl.Return(["name"], ["x"])]
+
+    assert canonical_form(program) == canonical_form(renamed)
+
+def test_statement_order_is_symmetric():
+    program = [works_for("a", "r", "b"), equal_to("location", "b", "US"), equal_to("name", "a", "Bob"),
+               dsl.Return(["name"], ["a"])]
+    reordered = [works_for("a", "r", "b"), equal_to("name", "a", "Bob"), equal_to("location", "b", "US"),
+                 dsl.Return(["name"], ["a"])]
+
+    assert canonical_form(program) == canonical_form(reordered)
+
+def test_node_matched_by_a_relation_is_dropped():
+    program = [dsl.Match(dsl.Node("Person", "a")), works_for("a", "r", "b"), dsl.Return(["name"], ["a"])]
+
+    assert canonical_form(program) == canonical_form([works_for("a", "r", "b"), dsl.Return(["name"], ["a"])])
+
+def test_different_programs_are_not_symmetric():
+    program = [works_for("a", "r", "b"), equal_to("location", "b", "US"), dsl.Return(["name"], ["a"])]
+
+    assert canonical_form(program) != canonical_form(
+        [works_for("a", "r", "b"), equal_to("location", "b", "UK"), dsl.Return(["name"], ["a"])])
+    assert canonical_form(program) != canonical_form(
+        [works_for("a", "r", "b"), equal_to("location", "b", "US"), dsl.Return(["name"], ["b"])])
+
+def test_equivalent_prefix(make_example):
+    pruner = CandidatePruner([InMemoryEvaluator(make_example(base="example1"))])
+    us = [works_for("a", "r", "b"), equal_to("location", "b", "US")]
+
+    assert not pruner.is_duplicate(us + [dsl.Return(["name"], ["a"])])
+    assert pruner.is_duplicate(us + [dsl.Return(["name"], ["a"])])
+
+    assert not pruner.is_equivalent_prefix(us, {"a", "r", "b"})
+    # matching the company alone first binds the same rows
+    assert pruner.is_equivalent_prefix([dsl.Match(dsl.Node("Company", "b"))] + us, {"a", "r", "b"})
+    assert not pruner.is_equivalent_prefix([works_for("a", "r", "b"), equal_to("location", "b", "UK")],
+                                           {"a", "r", "b"})
+
+@pytest.mark.parametrize("name", ["example1", "example2"])
+@pytest.mark.parametrize("undirected_relations", [False, True])
+def test_pruner_keeps_every_result(make_example, name, undirected_relations):
+    example = make_example(base=name)
+    synthesizer = Synthesizer(example, undirected_relations=undirected_relations)
+    target = tuple(sorted(tuple(record.values) for record in example.output))
+
+    pruned = candidate_results(synthesizer, 4, prune=True)
+    assert target in pruned
+    assert pruned == candidate_results(synthesizer, 4, prune=False)
+
+@pytest.mark.parametrize("case", [0, 1])
+@pytest.mark.parametrize("undirected_relations", [False, True])
+def test_pruner_keeps_every_result_of_generated_example(make_example, case, undirected_relations):
+    """
+    the generated examples have several labels and constants, so both pruning rules drop candidates
+    """
+    example = make_example(generated=case)
+    synthesizer = Synthesizer(example, undirected_relations=undirected_relations)
+    target = tuple(sorted(tuple(record.values) for record in example.output))
+
+    pruned = candidate_results(synthesizer, 4, prune=True)
+    assert target in pruned
+    assert pruned == candidate_results(synthesizer, 4, prune=False)
@@ -0,0 +1,38 @@
+from example_parser import examples_fingerprint
+from result_store import ResultStore
+from synthesizer import Synthesizer
+
+SHUFFLED = {
+    "node_company.csv": "node,Company\nid,location,company_name\n5,US,UTAustin\n0,UK,Google\n1,US,Google\n"
+                        "4,US,Amazon\n3,CN,Amazon\n2,JP,Amazon",
+    "rel_works_for.csv": "rel,WORKS_FOR\nid,Person,Company\n4,6,4\n2,5,1\n0,1,5\n3,4,2\n1,2,4",
+    "output.csv": "output\nperson_name,company_name\nJie,Amazon\nGeorge,Google\nAlice,UTAustin\nMike,Amazon",
+}
+
+def test_fingerprint_does_not_depend_on_row_order(make_example):
+    example = make_example(base="example1", name="a")
+    shuffled = make_example(SHUFFLED, base="example1", name="b")
+    changed = make_example({"output.csv": "output\nperson_name,company_name\nJie,Amazon"}, base="example1", name="c")
+
+    assert shuffled.fingerprint() == example.fingerprint()
+    assert examples_fingerprint([example, changed]) == examples_fingerprint([changed, shuffled])
+    assert changed.fingerprint() != example.fingerprint()
+
+def test_stored_result_of_shuffled_example(tmp_path, make_example):
+    store = ResultStore(str(tmp_path / "results.json"))
+    query = Synthesizer(make_example(base="example1", name="a"), result_store=store).synthesize()
+
+    # read back from the file
+    synthesizer = Synthesizer(make_example(SHUFFLED, base="example1", name="b"),
+                              result_store=ResultStore(str(tmp_path / "results.json")))
+    assert synthesizer.synthesize() == query
+    assert synthesizer.num_queries == 0
+
+def test_stored_result_is_keyed_by_options(tmp_path, make_example):
+    store = ResultStore(str(tmp_path / "results.json"))
+    fingerprint = make_example(base="example1").fingerprint()
+    store.put(fingerprint, False, 5, "<query>", 1.0)
+
+    assert store.get(fingerprint, False, 5)["query"] == "<query>"
+    assert store.get(fingerprint, True, 5) is None
+    assert store.get(fingerprint, False, 4) is None
@@ -0,0 +1,35 @@
+from scheduler import SketchScheduler
+from synthesizer import Synthesizer
+from dsl import Match, Require, Return
+
+
+def test_cheapest_sketch_first():
+    costs = {(Match, Return): 5.0, (Match, Require, Return): 1.0, (Match, Match, Return): 5.0}
+    scheduler = SketchScheduler(lambda sketch: costs[tuple(sketch)], 3)
+    for sketch in [[Match, Return], [Match, Match, Return], [Match, Require, Return]]:
+        scheduler.push(sketch)
+
+    # ties go to the smaller sketch, then to the one pushed first
+    assert [scheduler.pop() for _ in range(3)] == [[Match, Require, Return], [Match, Return], [Match, Match, Return]]
+    assert not scheduler
+
+def test_sketch_is_scheduled_once():
+    scheduler = SketchScheduler(lambda sketch: 0.0, 3)
+
+    assert scheduler.push([Match, Require, Return])
+    assert not scheduler.push([Match, Require, Return])
+    scheduler.pop()
+    assert not scheduler.push([Match, Require, Return])  # already searched
+    assert not scheduler.push([Match, Match, Require, Return])  # too large
+    assert len(scheduler) == 0
+
+def test_search_order(make_example):
+    synthesizer = Synthesizer(make_example(generated=1))
+    sketches = [tuple(sketch) for sketch in synthesizer._sketches(4)]
+
+    # every sketch of 2 to 4 statements once, the first one is the simpliest
+    assert len(sketches) == 6
+    assert set(sketches) == {(Match, Return), (Match, Require, Return), (Match, Match, Return),
+                             (Match, Require, Require, Return), (Match, Match, Require, Return),
+                             (Match, Match, Match, Return)}
+    assert sketches[0] == (Match, Return)
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from evaluator import InMemoryEvaluator
+from synthesizer import Synthesizer
+from async_synthesizer import AsyncSynthesizer
+from budget import SynthesisNotFound
+
+
+@pytest.mark.parametrize("name", ["example1", "example2"])
+def test_synthesize_finds_target(make_example, name):
+    example = make_example(base=name)
+    query = Synthesizer(example).synthesize()
+
+    assert "RETURN node1.person_name, node0.company_name" in query
+    assert 'node0.location = "US"' in query
+
+class ThreadedEvaluator(InMemoryEvaluator):
+    """
+    checked on threads as if it waited on a database
+    """
+    io_bound = True
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_parallel_search_matches_sequential(make_example, workers):
+    example = make_example(generated=1)
+    sequential = Synthesizer(example)
+    parallel = Synthesizer(example, evaluator=ThreadedEvaluator(example), workers=workers)
+
+    assert parallel.synthesize(4) == sequential.synthesize(4)
+    assert parallel.num_candidates == sequential.num_candidates
+    assert parallel.num_queries >= sequential.num_queries  # batches after the valid one may be checked already
+
+def test_in_memory_search_runs_on_one_worker(make_example):
+    with pytest.warns(UserWarning, match="not I/O-bound"):
+        synthesizer = Synthesizer(make_example(base="example1"), workers=4)
+
+    assert synthesizer.workers == 1
+
+@pytest.mark.parametrize("max_in_flight", [1, 8])
+def test_async_search_matches_sequential(make_example, max_in_flight):
+    example = make_example(generated=1)
+    synthesizer = AsyncSynthesizer(example, max_in_flight=max_in_flight, chunk_size=16)
+
+    assert asyncio.run(synthesizer.synthesize(4)) == Synthesizer(example).synthesize(4)
+
+def test_async_search_not_found(make_example):
+    example = make_example(generated=1)
+
+    with pytest.raises(SynthesisNotFound):
+        asyncio.run(AsyncSynthesizer(example).synthesize(2))
@@ -0,0 +1,60 @@
+import pytest
+
+from verdict_cache import VerdictCache
+from metrics import Metrics, CANDIDATES_CACHED
+from synthesizer import Synthesizer
+
+
+def test_second_search_takes_cached_verdicts(tmp_path, make_example):
+    example = make_example(base="example1")
+    cache = VerdictCache(str(tmp_path / "verdicts.db"))
+    first = Synthesizer(example, verdict_cache=cache)
+    query = first.synthesize()
+
+    metrics = Metrics()
+    second = Synthesizer(example, verdict_cache=cache, metrics=metrics)
+    assert second.synthesize() == query
+    assert second.num_queries == 0
+    assert metrics.snapshot()["counters"][CANDIDATES_CACHED] == first.num_queries
+
+def test_verdicts_are_keyed_by_the_synthesizer_examples(tmp_path, make_example):
+    cache = VerdictCache(str(tmp_path / "verdicts.db"))
+    Synthesizer(make_example(base="example1", name="a"), verdict_cache=cache).synthesize()
+
+    # the same candidates are rejected on example2, they are validated again
+    example2 = make_example(base="example2", name="b")
+    synthesizer = Synthesizer(example2, verdict_cache=cache)
+    assert synthesizer.synthesize() == Synthesizer(example2).synthesize()
+    assert synthesizer.num_queries > 0
+    assert (cache.graph_fingerprint, cache.output_fingerprint) == (example2.graph_fingerprint(),
+                                                                   example2.output_fingerprint())
+
+def test_cache_is_not_used_before_its_examples_are_known(tmp_path):
+    cache = VerdictCache(str(tmp_path / "verdicts.db"))
+
+    with pytest.raises(RuntimeError):
+        cache.get("<query>")
+
+def test_least_recently_used_verdicts_are_evicted(tmp_path, make_example):
+    cache = VerdictCache(str(tmp_path / "verdicts.db"), max_entries=10)
+    cache.use(make_example(base="example1"))
+    for i in range(10):
+        cache.put(f"q{i}", i % 2 == 0, i)
+    cache.get("q0")
+    cache.put("q10", True)  # the least recently used 2 of 11 are evicted
+
+    assert cache.get("q0") == (True, 0)
+    assert cache.get("q1") is None and cache.get("q2") is None
+    assert cache.get("q3") == (False, 3) and cache.get("q10") == (True, None)
+
+def test_verdicts_of_a_changed_graph_are_deleted(tmp_path, make_example):
+    path = str(tmp_path / "verdicts.db")
+    cache = VerdictCache(path)
+    cache.use(make_example(base="example1"))
+    cache.put("<query>", True, 4)
+    cache.close()
+
+    cache = VerdictCache(path)
+    cache.use(make_example({"rel_works_for.csv": "rel,WORKS_FOR\nid,Person,Company\n0,1,5"}))  # same directory
+    assert cache.get("<query>") is None
+    assert cache._num_entries == 0